@@ -0,0 +1,278 @@
+"""
+Benchmark suite for the Faction System's hot paths.
+
+Builds a synthetic hierarchy in a throwaway in-memory SQLite test database, then times and
+counts queries for the operations players hit most. Results are written as JSON so they
+can be compared between releases.
+
+Run it from a game directory whose settings install athanor_faction:
+
+    python -m athanor_faction.benchmarks --settings server.conf.settings --depth 4 --fanout 10 \
+        --members 10 --connected 0.25 --output bench_output.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+VERSION_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "VERSION.txt")
+
+
+class BenchSession:
+    """
+    Stand-in for a ServerSession: enough for controller calls and fan-out delivery.
+    """
+
+    def __init__(self, puppet_or_account):
+        self.puppet_or_account = puppet_or_account
+        self.received = 0
+
+    def get_puppet_or_account(self):
+        return self.puppet_or_account
+
+    def msg(self, *args, **kwargs):
+        self.received += 1
+
+
+class FactionBenchmark:
+
+    def __init__(self, depth=3, fanout=10, members=10, connected=0.25, characters=None, runs=50, seed=0):
+        self.depth = depth
+        self.fanout = fanout
+        self.members = members
+        self.connected = connected
+        self.characters = characters
+        self.runs = runs
+        self.random = random.Random(seed)
+        self.samples = defaultdict(list)
+        self.fanout_sizes = list()
+        self.controller = None
+        self.admin = None
+        self.session = None
+        self.factions = list()
+        self.pool = list()
+
+    def config(self):
+        return {'depth': self.depth, 'fanout': self.fanout, 'members': self.members, 'connected': self.connected,
+                'characters': self.characters, 'runs': self.runs}
+
+    def measure(self, name, func, *args, **kwargs):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+        self.samples[name].append((elapsed, len(queries.captured_queries)))
+        return result
+
+    def setup(self):
+        from django.conf import settings
+        from evennia import GLOBAL_SCRIPTS
+        from evennia.utils.create import create_account, create_object
+        self.controller = GLOBAL_SCRIPTS.faction
+        self.admin = create_account('BenchAdmin', 'bench@example.com', 'benchpassword', is_superuser=True)
+        self.session = BenchSession(self.admin)
+
+        specs = list()
+        level = [(None, None)]
+        for depth in range(self.depth):
+            next_level = list()
+            for parent_name, parent_path in level:
+                for number in range(self.fanout):
+                    name = f"{parent_name}-{number}" if parent_name else f"Bench{number}"
+                    specs.append({'name': name, 'parent': parent_path})
+                    next_level.append((name, f"{parent_path}/{name}" if parent_path else name))
+            level = next_level
+        self.factions, errors = self.measure('setup_provision', self.controller.provision_factions, specs)
+        if errors:
+            raise RuntimeError(f"Benchmark hierarchy could not be built: {errors}")
+
+        pool_size = self.characters or max(1, len(self.factions) * self.members // 4)
+        for number in range(pool_size):
+            self.pool.append(create_object(settings.BASE_CHARACTER_TYPECLASS, key=f"BenchChar{number}"))
+        for faction in self.factions:
+            for character in self.random.sample(self.pool, min(self.members, len(self.pool))):
+                self.controller.add_member(self.session, faction, character.entity)
+        for character in self.pool:
+            if self.random.random() < self.connected:
+                self.controller.at_character_connect(character, session=BenchSession(character))
+
+    def bench_find_faction(self):
+        paths = list(self.controller.ndb.faction_index.paths.values())
+        for path in self.random.sample(paths, min(self.runs, len(paths))):
+            self.measure('find_faction', self.controller.find_faction, path)
+
+    def command(self, cmdclass):
+        cmd = cmdclass()
+        cmd.caller = self.admin
+        cmd.account = self.admin
+        cmd.session = self.session
+        cmd.msg = self.session.msg
+        return cmd
+
+    def bench_display(self):
+        from athanor_faction.commands import CmdFactions
+        from athanor_faction.render import FactionRenderer
+        cmd = self.command(CmdFactions)
+        # No reactor runs here, so listings are formatted inline and the timings cover the
+        # whole render rather than just handing the snapshot to the thread pool.
+        renderer, self.controller.ndb.renderer = self.controller.ndb.renderer, FactionRenderer(max_threads=0)
+        try:
+            for _ in range(max(1, self.runs // 10)):
+                self.measure('display_factions', cmd.display_factions)
+            for faction in self.random.sample(self.factions, min(self.runs, len(self.factions))):
+                self.measure('display_faction', cmd.display_faction, faction)
+        finally:
+            self.controller.ndb.renderer = renderer
+
+    def bench_send_faction(self):
+        fanout = self.controller.ndb.fanout
+        roots = self.controller.sub_factions()
+        for faction in self.random.sample(self.factions, min(self.runs, len(self.factions))):
+            self.measure('send_faction', self.send_faction, faction, True)
+            self.fanout_sizes.append(len(fanout.recipients([faction.faction_bridge.pk], direct=True)))
+        for faction in roots:
+            self.measure('send_faction_descendants', self.send_faction, faction, False)
+        fanout.scheduled = False
+
+    def send_faction(self, faction, direct):
+        from athanor_faction.messages import FactionDescribeMessage
+        fanout = self.controller.ndb.fanout
+        FactionDescribeMessage(source=self.admin, faction=faction, message_descendants=not direct).send()
+        while fanout.pending:
+            fanout.flush()
+
+    def bench_subtree_members(self):
+        for faction in self.controller.sub_factions():
+            self.measure('subtree_members', faction.subtree_members)
+            self.measure('subtree_members_connected', faction.subtree_members, connected=True)
+
+    def bench_move_faction(self):
+        leaves = [f for f in self.factions if not self.controller.sub_factions(f) and f.parent]
+        roots = self.controller.sub_factions()
+        for faction in self.random.sample(leaves, min(self.runs, len(leaves))):
+            old_parent = faction.parent
+            new_parent = self.random.choice([r for r in roots if r != old_parent] or roots)
+            self.measure('move_faction', self.controller.move_faction, self.session, faction, new_parent)
+            self.controller.move_faction(self.session, faction, old_parent)
+
+    def bench_create_faction(self):
+        for number in range(self.runs):
+            faction = self.measure('create_faction', self.controller.create_faction, self.session,
+                                   f"BenchNew{number}", "Benchmark faction.")
+            self.controller.delete_faction(self.session, faction, faction.key)
+
+    def bench_remove_member(self):
+        for faction in self.random.sample(self.factions, min(self.runs, len(self.factions))):
+            if not (members := faction.member_entities()):
+                continue
+            entity = self.random.choice(members)
+            self.measure('remove_member', self.controller.remove_member, self.session, faction, entity)
+            self.controller.add_member(self.session, faction, entity)
+
+    def bench_event_dispatch(self):
+        from athanor_faction.events import FactionEventBus, FactionEvent, MemberAdded
+        bus = FactionEventBus()
+        bus.subscribe(FactionEvent, lambda event: None)
+        bus.subscribe(MemberAdded, lambda event: None)
+        events = [MemberAdded(number, number) for number in range(1000)]
+        for _ in range(self.runs):
+            self.measure('event_dispatch_sync', bus.dispatch, events)
+        bus.subscribe(MemberAdded, lambda event: None, deferred=True)
+        for _ in range(self.runs):
+            self.measure('event_dispatch_deferred', self.dispatch_deferred, bus, events)
+        for _ in range(self.runs):
+            self.measure('event_coalesce', self.coalesce, bus, events)
+
+    def dispatch_deferred(self, bus, events):
+        bus.dispatch(events)
+        bus.run_deferred()
+
+    def coalesce(self, bus, events):
+        with self.controller.unit_of_work():
+            for event in events:
+                bus.emit(event)
+                bus.emit(event)
+        bus.run_deferred()
+
+    def run(self):
+        self.setup()
+        try:
+            for name in sorted(dir(self)):
+                if name.startswith('bench_'):
+                    getattr(self, name)()
+        finally:
+            self.controller.ndb.renderer.stop()
+        return self.report()
+
+    def report(self):
+        results = dict()
+        for name, samples in sorted(self.samples.items()):
+            durations = sorted(elapsed for elapsed, queries in samples)
+            queries = [q for elapsed, q in samples]
+            results[name] = {
+                'runs': len(samples),
+                'seconds': {'min': durations[0], 'mean': statistics.mean(durations),
+                            'p95': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                            'max': durations[-1]},
+                'queries': {'mean': statistics.mean(queries), 'max': max(queries)},
+            }
+        if self.fanout_sizes:
+            results['send_faction']['recipients'] = {'mean': statistics.mean(self.fanout_sizes),
+                                                     'max': max(self.fanout_sizes)}
+        with open(VERSION_PATH) as version_file:
+            version = version_file.read().strip()
+        return {'version': version, 'factions': len(self.factions), 'config': self.config(), 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Athanor Faction System.")
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'server.conf.settings'))
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--members', type=int, default=10)
+    parser.add_argument('--connected', type=float, default=0.25)
+    parser.add_argument('--characters', type=int, default=None)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args(argv)
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    sys.path.insert(0, os.getcwd())
+    import django
+    from django.conf import settings
+
+    # Never touch the game's own database: benchmark against a fresh in-memory one.
+    settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+                                      'TEST': {'NAME': ':memory:'}}}
+    django.setup()
+    import evennia
+    evennia._init()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        bench = FactionBenchmark(depth=args.depth, fanout=args.fanout, members=args.members,
+                                 connected=args.connected, characters=args.characters, runs=args.runs,
+                                 seed=args.seed)
+        report = bench.run()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print(f"Wrote {len(report['results'])} benchmark results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,26 @@
+from django.core.paginator import Paginator
+from django.db.models import prefetch_related_objects
+
 from evennia import GLOBAL_SCRIPTS
+from evennia.utils.logger import log_err
 from athanor.commands.command import AthanorCommand
 
+from athanor_faction.render import text_row, render_listing, viewer_class
+from athanor_faction.stats import STATS
+
 
 class _CmdBase(AthanorCommand):
     help_category = 'Factions'
     system_name = 'FACTION'
+    page_size = 30
+
+    def func(self):
+        switch = self.switches[0].lower() if self.switches else 'main'
+        STATS.measure(f"{self.key}/{switch}", self._func_unit)
+
+    def _func_unit(self):
+        with GLOBAL_SCRIPTS.faction.unit_of_work():
+            super().func()
 
     def target_faction(self, search):
         return GLOBAL_SCRIPTS.faction.find_faction(search)
@@ -15,40 +31,59 @@ class _CmdBase(AthanorCommand):
             raise ValueError("You must select a faction via @faction/select !")
         return faction
 
+    def page_args(self):
+        page = self.lhs.strip() if self.lhs else '1'
+        if not page.isdigit():
+            raise ValueError("Page must be a positive number!")
+        return int(page), self.rhs.strip() if self.rhs else None
+
+    def paginate(self, queryset, page=1, name_filter=None):
+        if name_filter:
+            queryset = queryset.filter(db_name__icontains=name_filter)
+        return Paginator(queryset, self.page_size).get_page(page)
+
+    def page_footer(self, page):
+        return self.styled_footer(f"Page {page.number}/{page.paginator.num_pages}")
+
 
 class CmdFactions(_CmdBase):
     key = '@faction'
     aliases = ('@factions', '+groups', '@fac', '+group', '+guilds')
     switch_options = ('select', 'config', 'describe', 'create', 'subcreate', 'disband', 'rename', 'move', 'category',
-                      'abbreviation', 'lock', 'tier')
+                      'abbreviation', 'lock', 'tier', 'stats')
 
-    def display_faction_line(self, faction, depth=0):
-        fname = faction.get_display_name(self.caller)
-        main_members = [member.db.reference for member in faction.members() if member.entity.db.reference]
-        online_members = [char for char in main_members if char]
-        message = list()
-        if not depth:
-            message.append(f"{fname:<60}{len(online_members):0>3}/{len(main_members):0>3}")
-        else:
-            blank = ' ' * depth + '- '
-            message.append(f"{blank}{fname:<{60 - len(blank)}}{len(online_members):0>3}/{len(main_members):0>3}")
-        depth += 2
-        for child in faction.children.all().order_by('db_key'):
-            message += self.display_faction_line(child, depth)
-        return message
+    def faction_rows(self, faction, depth=0, viewer=None):
+        fac_con = GLOBAL_SCRIPTS.faction
+        if viewer is None:
+            viewer = viewer_class(self.caller)
+
+        def build():
+            return (str(faction.get_display_name(self.caller)), *fac_con.member_counts(faction))
+
+        rows = [fac_con.ndb.listing_cache.row(faction.faction_bridge.pk, viewer, depth, build)]
+        for child in fac_con.sub_factions(faction):
+            rows += self.faction_rows(child, depth + 2, viewer)
+        return rows
+
+    def send_listing(self, rows):
+        deferred = GLOBAL_SCRIPTS.faction.ndb.renderer.render(render_listing, tuple(rows))
+        deferred.addCallback(lambda text: self.msg(text))
+        deferred.addErrback(lambda failure: log_err(f"Faction listing failed to render: {failure}"))
+        return deferred
 
     def display_factions(self):
-        message = list()
-        message.append(self.styled_header('Factions'))
-        factions = GLOBAL_SCRIPTS.faction.factions()
+        rows = list()
+        rows.append(text_row(self.styled_header('Factions')))
+        factions = GLOBAL_SCRIPTS.faction.sub_factions()
+        viewer = viewer_class(self.caller)
         tier = None
         for faction in factions:
             if tier is None or int(tier) != int(faction.tier):
                 tier = faction.tier
-                message.append(self.styled_header(f"Tier {tier} Factions"))
-            message += self.display_faction_line(faction)
-        message.append(self.styled_footer(f'Selected: {self.caller.db.faction_select}'))
-        self.msg('\n'.join(str(l) for l in message))
+                rows.append(text_row(self.styled_header(f"Tier {tier} Factions")))
+            rows += self.faction_rows(faction, viewer=viewer)
+        rows.append(text_row(self.styled_footer(f'Selected: {self.caller.db.faction_select}')))
+        return self.send_listing(rows)
 
     def switch_main(self):
         self.msg(self.args)
@@ -62,23 +97,24 @@ class CmdFactions(_CmdBase):
         self.display_faction(faction)
 
     def display_faction(self, faction):
-        message = list()
-        message.append(self.styled_header(f"Faction: {faction.full_path()}"))
+        rows = list()
+        rows.append(text_row(self.styled_header(f"Faction: {faction.full_path()}")))
         desc = faction.db.desc
         if desc:
-            message.append(faction.db.desc)
-            message.append(self._blank_separator)
-        children = faction.children.all().order_by('db_key')
+            rows.append(text_row(desc))
+            rows.append(text_row(self._blank_separator))
+        children = GLOBAL_SCRIPTS.faction.sub_factions(faction)
         if children:
-            message.append(self.styled_separator('Sub-Factions'))
+            rows.append(text_row(self.styled_separator('Sub-Factions')))
+            viewer = viewer_class(self.caller)
             for child in children:
-                message += self.display_faction_line(child)
-        message.append(self._blank_footer)
-        self.msg('\n'.join(str(l) for l in message))
+                rows += self.faction_rows(child, viewer=viewer)
+        rows.append(text_row(self._blank_footer))
+        return self.send_listing(rows)
 
     def switch_select(self):
         faction = self.target_faction(self.args)
-        if not (faction.is_member(self.caller.entity) or self.access(self.caller, 'admin')):
+        if not (GLOBAL_SCRIPTS.faction.is_member(faction, self.caller.entity) or self.access(self.caller, 'admin')):
             raise ValueError("Cannot select a faction you have no place in!")
         self.caller.db.faction_select = faction
         self.sys_msg(f"You are now targeting the '{faction}' for faction commands!")
@@ -134,23 +170,54 @@ class CmdFactions(_CmdBase):
             tier = self.args
         GLOBAL_SCRIPTS.faction.set_tier(self.session, faction, tier)
 
+    def switch_stats(self):
+        if not GLOBAL_SCRIPTS.faction.access(self.caller, 'admin'):
+            raise ValueError("Permission denied.")
+        if self.args.strip().lower() == 'reset':
+            GLOBAL_SCRIPTS.faction.reset_stats(self.session)
+            self.sys_msg("Faction statistics reset.")
+            return
+        name_filter = self.args.strip().lower()
+        operations = GLOBAL_SCRIPTS.faction.stats_snapshot()['operations']
+        found = sorted(((name, ops) for name, ops in operations.items() if name_filter in name.lower()),
+                       key=lambda item: item[1]['wall_ms']['max'], reverse=True)
+        message = list()
+        message.append(self.styled_header('Faction Statistics'))
+        message.append(f"{'Operation':<34}{'Calls':>7}{'p50ms':>8}{'p95ms':>8}{'MaxMs':>9}{'Qry':>6}{'QryMs':>8}"
+                       f"{'Fanout':>8}")
+        for name, ops in found:
+            wall, queries, query_ms = ops['wall_ms'], ops['queries'], ops['query_ms']
+            message.append(f"{name[:33]:<34}{wall['count']:>7}{wall['p50']:>8.1f}{wall['p95']:>8.1f}"
+                           f"{wall['max']:>9.1f}{queries['mean']:>6.1f}{query_ms['mean']:>8.1f}{ops['fanout']['max']:>8}")
+        message.append(self.styled_footer(f"{len(found)} operations, slowest first"))
+        self.msg('\n'.join(str(l) for l in message))
+
 
 class CmdFacPriv(_CmdBase):
     key = '@facpriv'
-    switch_options = ('create', 'delete', 'describe', 'rename', 'assign', 'revoke')
+    switch_options = ('create', 'delete', 'describe', 'rename', 'assign', 'revoke', 'page')
 
     def display_privilege(self, priv):
-        pass
+        prefetch_related_objects([priv], 'roles')
+        message = list()
+        message.append(self.styled_header(f"Privilege: {priv.key}"))
+        if (desc := priv.db.desc):
+            message.append(desc)
+            message.append(self._blank_separator)
+        message.append(f"Roles: {', '.join([str(r) for r in priv.roles.all()])}")
+        message.append(self._blank_footer)
+        self.msg("\n".join(str(line) for line in message))
 
-    def display_privileges(self, faction):
-        privileges = faction.privileges.all()
+    def display_privileges(self, faction, page=1, name_filter=None):
+        privileges = self.paginate(faction.privileges.prefetch_related('roles').order_by('db_name'), page,
+                                   name_filter)
         message = list()
         message.append(self.styled_header(f"{faction} Privileges"))
         message.append(self.styled_columns(f"{'Name':<25}{'Roles'}"))
         message.append(self._blank_separator)
         for priv in privileges:
             message.append(f"{priv.key[:24]:<25}{', '.join([str(p) for p in priv.roles.all()])}")
-        message.append(self._blank_footer)
+        message.append(self.page_footer(privileges))
         self.msg("\n".join(str(line) for line in message))
 
     def switch_main(self):
@@ -162,6 +229,11 @@ class CmdFacPriv(_CmdBase):
             return self.display_privilege(found_priv)
         self.display_privileges(faction)
 
+    def switch_page(self):
+        faction = self.get_selected()
+        page, name_filter = self.page_args()
+        self.display_privileges(faction, page, name_filter)
+
     def switch_create(self):
         faction = self.get_selected()
         GLOBAL_SCRIPTS.faction.create_privilege(self.session, faction, self.lhs, self.rhs)
@@ -189,20 +261,29 @@ class CmdFacPriv(_CmdBase):
 
 class CmdFacRole(_CmdBase):
     key = '@facrole'
-    switch_options = ('create', 'rename', 'delete', 'assign', 'revoke', 'describe')
+    switch_options = ('create', 'rename', 'delete', 'assign', 'revoke', 'describe', 'page')
 
     def display_role(self, role):
-        pass
+        prefetch_related_objects([role], 'privileges')
+        message = list()
+        message.append(self.styled_header(f"Role: {role.key}"))
+        if (desc := role.db.desc):
+            message.append(desc)
+            message.append(self._blank_separator)
+        message.append(f"Sort: {str(role.sort_order).zfill(2)}")
+        message.append(f"Privileges: {', '.join([str(p) for p in role.privileges.all()])}")
+        message.append(self._blank_footer)
+        self.msg("\n".join(str(line) for line in message))
 
-    def display_roles(self, faction):
-        roles = faction.roles.all()
+    def display_roles(self, faction, page=1, name_filter=None):
+        roles = self.paginate(faction.roles.prefetch_related('privileges').order_by('db_name'), page, name_filter)
         message = list()
         message.append(self.styled_header(f"{faction} Roles"))
         message.append(self.styled_columns(f"{'Name':<25}Sort Privileges"))
         message.append(self._blank_separator)
         for role in roles:
             message.append(f"{role.key[:24]:<25}{str(role.sort_order).zfill(2):>4}{', '.join([str(r) for r in role.privileges.all()])}")
-        message.append(self._blank_footer)
+        message.append(self.page_footer(roles))
         self.msg("\n".join(str(line) for line in message))
 
     def switch_main(self):
@@ -214,6 +295,11 @@ class CmdFacRole(_CmdBase):
             return self.display_role(found_role)
         self.display_roles(faction)
 
+    def switch_page(self):
+        faction = self.get_selected()
+        page, name_filter = self.page_args()
+        self.display_roles(faction, page, name_filter)
+
     def switch_create(self):
         role = GLOBAL_SCRIPTS.faction.create_role(self.session, self.lhs, self.rhs)
 
@@ -265,10 +351,13 @@ class CmdFacMember(_CmdBase):
 
     def switch_join(self):
         faction = GLOBAL_SCRIPTS.faction.find_faction(self.args)
-        link = faction.link(self.caller)
-        if not link.db.invited:
+        try:
+            membership = faction.membership(self.caller.entity, create=False)
+        except ValueError:
+            membership = None
+        if not (membership and membership.db_invited):
             raise ValueError(f"You haven't been invited to the {faction}! But.. maybe you could /apply to them.")
-        GLOBAL_SCRIPTS.faction.accept_invite(self.session, link)
+        GLOBAL_SCRIPTS.faction.accept_invite(self.session, membership)
 
     def switch_kick(self):
         faction = self.get_selected()
@@ -284,6 +373,11 @@ class CmdFacMember(_CmdBase):
         character = self.search_one_character(self.args)
         GLOBAL_SCRIPTS.faction.uninvite_character(self.session, faction, character)
 
+    def switch_rank(self):
+        faction = self.get_selected()
+        character = self.search_one_character(self.lhs)
+        GLOBAL_SCRIPTS.faction.rank_member(self.session, faction, character, self.rhs)
+
     def switch_title(self):
         faction = self.get_selected()
         character = self.search_one_character(self.lhs)
@@ -295,4 +389,114 @@ class CmdFacMember(_CmdBase):
         GLOBAL_SCRIPTS.faction.set_supermember(self.session, faction, character, self.rhs)
 
 
-FACTION_COMMANDS = [CmdFactions, CmdFacPriv, CmdFacRole, CmdFacMember]
+class CmdFacDivision(_CmdBase):
+    key = '@facdiv'
+    aliases = ('@facdivision', '@facdivisions')
+    switch_options = ('create', 'rename', 'delete', 'assign', 'unassign', 'msg')
+
+    def display_divisions(self, faction):
+        fac_con = GLOBAL_SCRIPTS.faction
+        message = list()
+        message.append(self.styled_header(f"Divisions of {faction.full_path()}"))
+        for division in fac_con.faction_divisions(faction):
+            online_members, main_members = fac_con.division_counts(division)
+            message.append(f"{division.key:<60}{online_members:0>3}/{main_members:0>3}")
+        message.append(self._blank_footer)
+        self.msg('\n'.join(str(l) for l in message))
+
+    def switch_main(self):
+        if self.args:
+            division = GLOBAL_SCRIPTS.faction.find_division(self.args, faction=self.caller.db.faction_select)
+            self.display_divisions(division.faction)
+            return
+        self.display_divisions(self.get_selected())
+
+    def switch_create(self):
+        faction = self.get_selected()
+        GLOBAL_SCRIPTS.faction.create_division(self.session, faction, self.lhs, self.rhs)
+
+    def switch_rename(self):
+        faction = self.get_selected()
+        division = GLOBAL_SCRIPTS.faction.find_division(self.lhs, faction=faction)
+        GLOBAL_SCRIPTS.faction.rename_division(self.session, division, self.rhs)
+
+    def switch_delete(self):
+        faction = self.get_selected()
+        division = GLOBAL_SCRIPTS.faction.find_division(self.lhs, faction=faction)
+        GLOBAL_SCRIPTS.faction.delete_division(self.session, division, self.rhs)
+
+    def switch_assign(self):
+        faction = self.get_selected()
+        character = self.search_one_character(self.lhs)
+        if not self.rhs:
+            raise ValueError("No division entered to assign them to!")
+        GLOBAL_SCRIPTS.faction.assign_division(self.session, faction, character, self.rhs)
+
+    def switch_unassign(self):
+        faction = self.get_selected()
+        character = self.search_one_character(self.args)
+        GLOBAL_SCRIPTS.faction.assign_division(self.session, faction, character, None)
+
+    def switch_msg(self):
+        division = GLOBAL_SCRIPTS.faction.find_division(self.lhs, faction=self.caller.db.faction_select)
+        GLOBAL_SCRIPTS.faction.message_division(self.session, division, self.rhs)
+
+
+class CmdAlliances(_CmdBase):
+    key = '@alliance'
+    aliases = ('@alliances', '+alliance', '+alliances')
+    switch_options = ('create', 'disband', 'rename', 'join', 'leave')
+
+    def display_alliances(self):
+        fac_con = GLOBAL_SCRIPTS.faction
+        message = list()
+        message.append(self.styled_header('Alliances'))
+        for bridge in sorted(fac_con.ndb.alliances.values(), key=lambda b: b.db_iname):
+            online_members, main_members = fac_con.alliance_counts(bridge)
+            name = bridge.db_object.get_display_name(self.caller)
+            message.append(f"{name:<60}{online_members:0>3}/{main_members:0>3}")
+        message.append(self._blank_footer)
+        self.msg('\n'.join(str(l) for l in message))
+
+    def display_alliance(self, alliance):
+        fac_con = GLOBAL_SCRIPTS.faction
+        online_members, main_members = fac_con.alliance_counts(alliance)
+        message = list()
+        message.append(self.styled_header(f"Alliance: {alliance.key} ({online_members}/{main_members})"))
+        if (desc := alliance.db.desc):
+            message.append(desc)
+            message.append(self._blank_separator)
+        message.append(self.styled_separator('Member Factions'))
+        for faction in fac_con.alliance_factions(alliance):
+            online_members, main_members = fac_con.member_counts(faction, direct=False)
+            message.append(f"{faction.full_path():<60}{online_members:0>3}/{main_members:0>3}")
+        message.append(self._blank_footer)
+        self.msg('\n'.join(str(l) for l in message))
+
+    def switch_main(self):
+        if not self.args:
+            self.display_alliances()
+            return
+        self.display_alliance(GLOBAL_SCRIPTS.faction.find_alliance(self.args))
+
+    def switch_create(self):
+        GLOBAL_SCRIPTS.faction.create_alliance(self.session, self.lhs, self.rhs)
+
+    def switch_disband(self):
+        GLOBAL_SCRIPTS.faction.delete_alliance(self.session, self.lhs, self.rhs)
+
+    def switch_rename(self):
+        GLOBAL_SCRIPTS.faction.rename_alliance(self.session, self.lhs, self.rhs)
+
+    def switch_join(self):
+        faction = self.target_faction(self.lhs)
+        if not self.rhs:
+            raise ValueError("No alliance entered to join!")
+        GLOBAL_SCRIPTS.faction.set_faction_alliance(self.session, faction, self.rhs)
+
+    def switch_leave(self):
+        faction = self.target_faction(self.args)
+        GLOBAL_SCRIPTS.faction.set_faction_alliance(self.session, faction, None)
+
+
+FACTION_COMMANDS = [CmdFactions, CmdFacPriv, CmdFacRole, CmdFacMember, CmdFacDivision, CmdAlliances]
@@ -1,17 +1,67 @@
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 
+from evennia import GLOBAL_SCRIPTS
+from evennia.objects.models import ObjectDB
+from evennia.server.signals import SIGNAL_OBJECT_POST_PUPPET, SIGNAL_OBJECT_POST_UNPUPPET
 from evennia.utils.utils import class_from_module
 from evennia.utils.logger import log_trace
 
 from athanor.gamedb.scripts import AthanorGlobalScript
-from athanor.gamedb.factions import AthanorFaction, AthanorAlliance, AthanorDivision
 from athanor.utils.valid import simple_name
 from athanor.utils.text import partial_match
-from athanor.gamedb.models import FactionBridge, DivisionBridge, AllianceBridge
-from athanor.messages import factions as fmsg
-
 
+from athanor_faction.gamedb import AthanorFaction, AthanorAlliance, AthanorDivision
+from athanor_faction.models import FactionBridge, DivisionBridge, AllianceBridge, FactionClosure, FactionMembership
+from athanor_faction.indexes import FactionTreeIndex, DivisionIndex, FactionRosterIndex
+from athanor_faction.fanout import FactionFanout
+from athanor_faction.privileges import PrivilegeResolver
+from athanor_faction.provisioning import FactionProvisioner
+from athanor_faction.locks import LockCache
+from athanor_faction.maintenance import FactionMaintenance
+from athanor_faction.transfer import FactionExporter, FactionImporter
+from athanor_faction.stats import STATS, instrument_methods
+from athanor_faction.warmup import FactionWarmup
+from athanor_faction.registry import NameRegistry
+from athanor_faction.render import FactionRenderer, ListingCache
+from athanor_faction.unitofwork import unit_of_work, mark_dirty, on_rollback, refresh_on_rollback
+from athanor_faction import events as fev
+from athanor_faction import messages as fmsg
+
+
+def _packed_id(value):
+    # Evennia stores Object references in Attributes as
+    # ('__packed_dbobj__', natural_key, date_created, id).
+    if isinstance(value, (tuple, list)) and len(value) == 4 and value[0] == '__packed_dbobj__':
+        return value[3]
+    return None
+
+
+def _at_character_puppet(sender, session=None, **kwargs):
+    GLOBAL_SCRIPTS.faction.at_character_connect(sender, session=session)
+
+
+def _at_character_unpuppet(sender, session=None, **kwargs):
+    GLOBAL_SCRIPTS.faction.at_character_disconnect(sender, session=session)
+
+
+MEASURED = (
+    'warm_up', 'at_repeat', 'broadcast', 'broadcast_alliance', 'broadcast_division', 'set_system_identifier',
+    'create_alliance', 'delete_alliance', 'rename_alliance', 'set_faction_alliance',
+    'create_division', 'rename_division', 'delete_division', 'assign_division', 'message_division',
+    'create_faction', 'provision_factions', 'export_factions', 'import_factions', 'delete_faction', 'rename_faction',
+    'describe_faction', 'set_tier', 'move_faction', 'set_abbreviation', 'set_lock', 'config_faction',
+    'create_privilege', 'delete_privilege', 'rename_privilege', 'describe_privilege', 'assign_privilege',
+    'revoke_privilege', 'create_role', 'delete_role', 'rename_role', 'describe_role',
+    'direct_add_member', 'kick_member', 'leave_faction', 'add_member', 'remove_member',
+    'send_application', 'withdraw_application', 'accept_application', 'invite_character', 'uninvite_character',
+    'accept_invite', 'assign_role', 'revoke_role', 'rank_member', 'title_member', 'set_supermember',
+)
+
+
+@instrument_methods('faction', MEASURED)
 class AthanorFactionController(AthanorGlobalScript):
     system_name = 'FACTION'
     option_dict = {
@@ -24,11 +74,250 @@ class AthanorFactionController(AthanorGlobalScript):
     def at_start(self):
         from django.conf import settings
         try:
-            get_typeclass = getattr(settings, "BASE_FACTION_TYPECLASS",  "athanor.gamedb.factions.AthanorFaction")
+            get_typeclass = getattr(settings, "BASE_FACTION_TYPECLASS",  "athanor_faction.gamedb.AthanorFaction")
             self.ndb.faction_typeclass = class_from_module(get_typeclass, defaultpaths=settings.TYPECLASS_PATHS)
         except Exception:
             log_trace()
             self.ndb.faction_typeclass = AthanorFaction
+        try:
+            get_typeclass = getattr(settings, "BASE_ALLIANCE_TYPECLASS", "athanor_faction.gamedb.AthanorAlliance")
+            self.ndb.alliance_typeclass = class_from_module(get_typeclass, defaultpaths=settings.TYPECLASS_PATHS)
+        except Exception:
+            log_trace()
+            self.ndb.alliance_typeclass = AthanorAlliance
+        try:
+            get_typeclass = getattr(settings, "BASE_DIVISION_TYPECLASS", "athanor_faction.gamedb.AthanorDivision")
+            self.ndb.division_typeclass = class_from_module(get_typeclass, defaultpaths=settings.TYPECLASS_PATHS)
+        except Exception:
+            log_trace()
+            self.ndb.division_typeclass = AthanorDivision
+        self.build_faction_index()
+        self.build_alliance_index()
+        self.build_division_index()
+        self.build_name_registry()
+        self.build_roster_index()
+        self.ndb.privileges = PrivilegeResolver()
+        self.ndb.lock_cache = LockCache(ttl=getattr(settings, 'FACTION_LOCK_DECISION_TTL', 5.0))
+        self.ndb.renderer = FactionRenderer(max_threads=getattr(settings, 'FACTION_RENDER_THREADS', 2),
+                                            threshold=getattr(settings, 'FACTION_RENDER_THRESHOLD', 500))
+        self.ndb.listing_cache = ListingCache(max_entries=getattr(settings, 'FACTION_LISTING_CACHE_SIZE', 5000))
+        self.ndb.events = fev.FactionEventBus()
+        for event_type in (fev.FactionRenamed, fev.FactionMoved, fev.FactionDeleted, fev.MemberAdded,
+                           fev.MemberRemoved):
+            self.ndb.events.subscribe(event_type, self.at_listing_event)
+        self.warm_up(getattr(settings, 'FACTION_WARMUP', 'lazy'))
+        self.ndb.maintenance = FactionMaintenance(
+            self, budget=getattr(settings, 'FACTION_MAINTENANCE_BUDGET', 0.005),
+            batch_size=getattr(settings, 'FACTION_MAINTENANCE_BATCH', 100),
+            application_expiry=getattr(settings, 'FACTION_APPLICATION_EXPIRY_DAYS', 30),
+            invite_expiry=getattr(settings, 'FACTION_INVITE_EXPIRY_DAYS', 7),
+            cursor=self.db.maintenance_cursor)
+        SIGNAL_OBJECT_POST_PUPPET.connect(_at_character_puppet, dispatch_uid='athanor_faction_puppet')
+        SIGNAL_OBJECT_POST_UNPUPPET.connect(_at_character_unpuppet, dispatch_uid='athanor_faction_unpuppet')
+
+    def warm_up(self, mode='eager'):
+        try:
+            FactionWarmup(self, chunk_size=getattr(settings, 'FACTION_WARMUP_CHUNK', 500)).start(mode)
+        except Exception:
+            log_trace()
+
+    def at_stop(self):
+        if self.ndb.renderer:
+            self.ndb.renderer.stop()
+
+    def at_repeat(self):
+        if not self.ndb.maintenance:
+            return
+        try:
+            cursor = self.ndb.maintenance.run()
+        except Exception:
+            log_trace()
+            return
+        if cursor != self.db.maintenance_cursor:
+            self.db.maintenance_cursor = cursor
+
+    def build_faction_index(self):
+        index = FactionTreeIndex()
+        index.build(FactionBridge.objects.select_related('db_object'))
+        self.ndb.faction_index = index
+
+    def build_alliance_index(self):
+        self.ndb.alliances = {bridge.pk: bridge for bridge in AllianceBridge.objects.select_related('db_object')}
+
+    def build_division_index(self):
+        index = DivisionIndex()
+        index.build(DivisionBridge.objects.select_related('db_object'))
+        self.ndb.division_index = index
+
+    def build_name_registry(self):
+        registry = NameRegistry()
+        registry.build('alliance', self.ndb.alliances.values())
+        registry.build('faction', self.ndb.faction_index.bridges.values())
+        registry.build('division', self.ndb.division_index.bridges.values())
+        self.ndb.names = registry
+
+    def load_references(self, entity_ids, chunk_size=500):
+        """
+        Maps entity id -> Character for many entities at once, reading their 'reference'
+        Attributes and then the Characters in chunks rather than one lookup per entity.
+        """
+        entity_ids = list(entity_ids)
+        through = ObjectDB.db_attributes.through
+        references = dict()
+        for start in range(0, len(entity_ids), chunk_size):
+            for entity_id, value in through.objects.filter(
+                    objectdb_id__in=entity_ids[start:start + chunk_size], attribute__db_key='reference',
+                    attribute__db_category__isnull=True).values_list('objectdb_id', 'attribute__db_value'):
+                if (character_id := _packed_id(value)) is not None:
+                    references[entity_id] = character_id
+        character_ids = list(set(references.values()))
+        characters = dict()
+        for start in range(0, len(character_ids), chunk_size):
+            characters.update({obj.id: obj for obj in ObjectDB.objects.filter(
+                id__in=character_ids[start:start + chunk_size])})
+        return {entity_id: characters.get(references.get(entity_id)) for entity_id in entity_ids}
+
+    def build_roster_index(self):
+        roster = FactionRosterIndex(self.ndb.faction_index)
+        memberships = list(FactionMembership.objects.filter(db_member=True).select_related('db_entity'))
+        characters = self.load_references({membership.db_entity_id for membership in memberships})
+        for membership in memberships:
+            roster.add(membership.db_faction_id, membership.db_entity,
+                       character=characters.get(membership.db_entity_id))
+            if membership.db_division_id is not None:
+                roster.set_division(membership.db_entity_id, new_division_id=membership.db_division_id)
+        self.ndb.roster_index = roster
+        self.ndb.fanout = FactionFanout(roster)
+
+    def refresh_roster(self, faction):
+        self.ndb.roster_index.refresh(faction.faction_bridge.pk, faction.member_entities())
+        self.invalidate_listing(faction)
+
+    def invalidate_listing(self, *factions):
+        if self.ndb.listing_cache:
+            self.ndb.listing_cache.invalidate(faction.faction_bridge.pk for faction in factions if faction)
+
+    def at_listing_event(self, event):
+        self.ndb.listing_cache.invalidate((event.faction_id,))
+
+    def invalidate_entity_listing(self, entity):
+        if self.ndb.listing_cache:
+            self.ndb.listing_cache.invalidate(self.ndb.roster_index.memberships.get(entity.id, tuple()))
+
+    def member_counts(self, faction, direct=True):
+        return self.ndb.roster_index.get(faction.faction_bridge.pk, direct=direct)
+
+    def connected_members(self, faction, direct=True):
+        return self.ndb.roster_index.online_characters(faction.faction_bridge.pk, direct=direct)
+
+    def at_character_connect(self, character, session=None):
+        if (entity := getattr(character, 'entity', None)):
+            self.ndb.roster_index.connect(entity, character, session=session)
+            self.invalidate_entity_listing(entity)
+
+    def at_character_disconnect(self, character, session=None):
+        if session is None and character.sessions.count():
+            return
+        if (entity := getattr(character, 'entity', None)):
+            self.ndb.roster_index.disconnect(entity, session=session)
+            self.invalidate_entity_listing(entity)
+
+    def unit_of_work(self):
+        return unit_of_work()
+
+    def broadcast(self, factions, text, direct=True, exclude=None):
+        fanout = self.ndb.fanout
+        exclude = {entity.id for obj in (exclude or tuple()) if (entity := getattr(obj, 'entity', None))}
+        entity_ids = fanout.recipients([faction.faction_bridge.pk for faction in factions], direct=direct,
+                                       exclude=exclude)
+        fanout.deliver(fanout.sessions(entity_ids), text)
+        STATS.add_fanout(len(entity_ids))
+        return len(entity_ids)
+
+    def broadcast_alliance(self, alliance, text, exclude=None):
+        fanout = self.ndb.fanout
+        exclude = {entity.id for obj in (exclude or tuple()) if (entity := getattr(obj, 'entity', None))}
+        entity_ids = fanout.alliance_recipients([alliance.alliance_bridge.pk], exclude=exclude)
+        fanout.deliver(fanout.sessions(entity_ids), text)
+        STATS.add_fanout(len(entity_ids))
+        return len(entity_ids)
+
+    def broadcast_division(self, division, text, exclude=None):
+        fanout = self.ndb.fanout
+        exclude = {entity.id for obj in (exclude or tuple()) if (entity := getattr(obj, 'entity', None))}
+        entity_ids = self.ndb.roster_index.division_online(division.division_bridge.pk) - exclude
+        fanout.deliver(fanout.sessions(entity_ids), text)
+        STATS.add_fanout(len(entity_ids))
+        return len(entity_ids)
+
+    def stats_snapshot(self):
+        return STATS.snapshot()
+
+    def reset_stats(self, session=None):
+        if session is not None:
+            enactor = session.get_puppet_or_account()
+            if not self.access(enactor, 'admin'):
+                raise ValueError("Permission denied.")
+        STATS.reset()
+
+    def is_member(self, faction, entity):
+        return entity.id in self.ndb.roster_index.members.get(faction.faction_bridge.pk, tuple())
+
+    def is_supermember(self, faction, enactor):
+        if not (entity := getattr(enactor, 'entity', None)):
+            return False
+        return self.ndb.privileges.is_supermember(faction, entity)
+
+    def has_privilege(self, enactor, faction, privilege):
+        if not (entity := getattr(enactor, 'entity', None)):
+            return False
+        return self.ndb.privileges.check(faction, entity, privilege)
+
+    def ancestors(self, faction, include_self=False):
+        found = FactionClosure.objects.ancestor_ids(faction.faction_bridge, include_self=include_self)
+        return [self.ndb.faction_index.bridges[bridge_id].db_object for bridge_id in found]
+
+    def descendants(self, faction, include_self=False):
+        found = FactionClosure.objects.descendant_ids(faction.faction_bridge, include_self=include_self)
+        return [self.ndb.faction_index.bridges[bridge_id].db_object for bridge_id in found]
+
+    def entity_factions(self, entity):
+        return [bridge.db_object for bridge in FactionBridge.objects.filter(
+            memberships__db_entity=entity, memberships__db_member=True).select_related('db_object')]
+
+    def sub_factions(self, faction=None):
+        parent = faction.faction_bridge if faction else None
+        return [bridge.db_object for bridge in self.ndb.faction_index.ordered_children(parent)]
+
+    def access(self, accessing_obj, access_type='read', default=False, no_superuser_bypass=False, **kwargs):
+        if not self.ndb.lock_cache:
+            return super().access(accessing_obj, access_type, default=default,
+                                  no_superuser_bypass=no_superuser_bypass, **kwargs)
+        lockstrings = (str(self.options.get('system_locks')),)
+        return self.ndb.lock_cache.check(accessing_obj, self, access_type, lockstrings, default=default,
+                                         no_superuser_bypass=no_superuser_bypass)
+
+    def get_lock_cache(self):
+        if not self.ndb.lock_cache:
+            self.ndb.lock_cache = LockCache(ttl=getattr(settings, 'FACTION_LOCK_DECISION_TTL', 5.0))
+        return self.ndb.lock_cache
+
+    def invalidate_member_access(self, faction, entity):
+        """
+        Forgets an entity's cached privileges in faction and every cached lock decision for
+        it, its Character and Account, since lock functions like fmember() and
+        fsupermember() read its memberships.
+        """
+        self.ndb.privileges.invalidate_member(faction, entity)
+        if not self.ndb.lock_cache:
+            return
+        character = self.ndb.roster_index.characters.get(entity.id) or entity.db.reference
+        self.ndb.lock_cache.invalidate_accessors(entity, character, getattr(character, 'account', None))
+
+    def faction_access(self, faction, accessing_obj, access_type, default=False, no_superuser_bypass=False):
+        lockstrings = (faction.lock_storage, str(self.options.get('faction_locks')))
+        return self.get_lock_cache().check(accessing_obj, faction, access_type, lockstrings, default=default,
+                                         no_superuser_bypass=no_superuser_bypass)
 
     def factions(self, parent=None):
         return AthanorFaction.objects.filter_family(faction_bridge__db_parent=parent).order_by('-faction_bridge__db_tier', 'db_key')
@@ -40,22 +329,264 @@ class AthanorFactionController(AthanorGlobalScript):
             return search_text
         if isinstance(search_text, FactionBridge):
             return search_text.db_object
-        search_tree = [text.strip() for text in search_text.split('/')] if '/' in search_text else [search_text]
-        found = None
-        for srch in search_tree:
-            found = partial_match(srch, self.factions(found))
-            if not found:
-                raise ValueError(f"Faction {srch} not found!")
-        return found.db_object
+        return self.ndb.faction_index.find(search_text).db_object
+
+    def find_by_identifier(self, kind, identifier):
+        if kind not in ('alliance', 'faction', 'division'):
+            raise ValueError(f"Unknown kind: {kind}")
+        if (found := self.ndb.names.get(f"{kind}_identifier", identifier)) is None:
+            raise ValueError(f"No {kind} has the identifier {identifier}!")
+        bridges = {'alliance': self.ndb.alliances, 'faction': self.ndb.faction_index.bridges,
+                   'division': self.ndb.division_index.bridges}[kind]
+        return bridges[found].db_object
+
+    def set_system_identifier(self, session, target, identifier):
+        enactor = session.get_puppet_or_account()
+        if not self.access(enactor, 'admin'):
+            raise ValueError("Permission denied.")
+        for kind in ('alliance', 'faction', 'division'):
+            if (bridge := getattr(target, f"{kind}_bridge", None)) is not None:
+                break
+        else:
+            raise ValueError(f"{target} is not an Alliance, Faction or Division!")
+        identifier = identifier.strip() if identifier else None
+        with self.unit_of_work(), self.ndb.names.replace(f"{kind}_identifier", bridge.pk, identifier) as reserved:
+            bridge.db_system_identifier = identifier
+            mark_dirty(bridge, 'db_system_identifier')
+            reserved.commit(bridge.pk)
+
+    def find_alliance(self, search_text):
+        if not search_text:
+            raise ValueError("No alliance entered to search for!")
+        if isinstance(search_text, AthanorAlliance):
+            return search_text
+        if isinstance(search_text, AllianceBridge):
+            return search_text.db_object
+        names = self.ndb.names
+        if (found := names.get('alliance_name', search_text)) or (found := names.get('alliance_abbreviation',
+                                                                                     search_text)):
+            return self.ndb.alliances[found].db_object
+        bridges = list(self.ndb.alliances.values())
+        if not (found := partial_match(search_text, [bridge.db_object for bridge in bridges])):
+            raise ValueError(f"Alliance {search_text} not found!")
+        return found
+
+    def alliance_factions(self, alliance):
+        return self.find_alliance(alliance).factions()
+
+    def alliance_counts(self, alliance):
+        return self.ndb.roster_index.alliance_get(self.find_alliance(alliance).alliance_bridge.pk)
+
+    def create_alliance(self, session, name, description, abbr=None):
+        enactor = session.get_puppet_or_account()
+        if not self.access(enactor, 'create', default='perm(Admin)'):
+            raise ValueError("Permission denied.")
+        with self.unit_of_work():
+            alliance = self.ndb.alliance_typeclass.create_alliance(name, abbr=abbr, description=description)
+            self.ndb.alliances[alliance.alliance_bridge.pk] = alliance.alliance_bridge
+            on_rollback(lambda: self.ndb.alliances.pop(alliance.alliance_bridge.pk, None))
+        fmsg.AllianceCreateMessage(source=enactor, alliance=alliance).send()
+        return alliance
+
+    def delete_alliance(self, session, alliance, verify_name=None):
+        enactor = session.get_puppet_or_account()
+        if not self.access(enactor, 'delete', default='perm(Admin)'):
+            raise ValueError("Permission denied.")
+        alliance = self.find_alliance(alliance)
+        if not verify_name or not (alliance.key.lower() == verify_name.lower()):
+            raise ValueError("Name of the alliance must match the one provided to verify deletion.")
+        if alliance.alliance_bridge.factions.exists():
+            raise ValueError("Cannot disband an alliance that still has member factions!")
+        fmsg.AllianceDeleteMessage(source=enactor, alliance=alliance).send()
+        bridge_id = alliance.alliance_bridge.pk
+        with self.unit_of_work():
+            alliance.delete()
+            self.ndb.names.release_owner(bridge_id)
+            on_rollback(self.build_roster_index)
+            on_rollback(self.build_alliance_index)
+            self.ndb.alliances.pop(bridge_id, None)
+            self.ndb.roster_index.alliance_members.pop(bridge_id, None)
+            self.ndb.roster_index.alliance_online.pop(bridge_id, None)
+
+    def rename_alliance(self, session, alliance, new_name):
+        enactor = session.get_puppet_or_account()
+        alliance = self.find_alliance(alliance)
+        if not self.access(enactor, 'admin'):
+            raise ValueError("Permission denied.")
+        old_name = alliance.key
+        with self.unit_of_work():
+            alliance.rename(new_name)
+        fmsg.AllianceRenameMessage(source=enactor, alliance=alliance, old_name=old_name).send()
+
+    def set_faction_alliance(self, session, faction, alliance=None):
+        enactor = session.get_puppet_or_account()
+        faction = self.find_faction(faction)
+        alliance = self.find_alliance(alliance) if alliance else None
+        if not self.access(enactor, 'admin'):
+            raise ValueError("Permission denied.")
+        old_alliance = faction.alliance
+        if old_alliance == alliance:
+            raise ValueError("That doesn't make it go anywhere!")
+        if old_alliance:
+            fmsg.AllianceLeaveMessage(source=enactor, faction=faction, alliance=old_alliance).send()
+        bridge = faction.faction_bridge
+        old_alliance_id = bridge.db_alliance_id
+        with self.unit_of_work():
+            faction.change_alliance(alliance)
+            new_alliance_id = bridge.db_alliance_id
+            self.realign_alliance(bridge.pk, old_alliance_id)
+            on_rollback(lambda: self.realign_alliance(bridge.pk, new_alliance_id))
+        if alliance:
+            fmsg.AllianceJoinMessage(source=enactor, faction=faction, alliance=alliance).send()
+
+    def realign_alliance(self, bridge_id, old_alliance_id):
+        self.ndb.roster_index.leave_alliance(bridge_id, old_alliance_id)
+        self.ndb.roster_index.join_alliance(bridge_id)
+
+    def find_division(self, search_text, faction=None):
+        if not search_text:
+            raise ValueError("No division entered to search for!")
+        if isinstance(search_text, AthanorDivision):
+            return search_text
+        if isinstance(search_text, DivisionBridge):
+            return search_text.db_object
+        if faction is not None and '/' not in search_text:
+            if not (found := self.ndb.division_index.match(faction.faction_bridge.pk, search_text)):
+                raise ValueError(f"Division {search_text} not found in {faction.full_path()}!")
+            return found.db_object
+        return self.ndb.division_index.find(self.ndb.faction_index, search_text).db_object
+
+    def faction_divisions(self, faction):
+        return [bridge.db_object for bridge in self.ndb.division_index.for_faction(faction.faction_bridge.pk)]
+
+    def division_counts(self, division):
+        members = self.ndb.roster_index.divisions.get(division.division_bridge.pk, tuple())
+        return len(self.ndb.roster_index.division_online(division.division_bridge.pk)), len(members)
+
+    def create_division(self, session, faction, name, description=None):
+        enactor = session.get_puppet_or_account()
+        faction = self.find_faction(faction)
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        with self.unit_of_work():
+            division = self.ndb.division_typeclass.create_division(faction, name, description=description)
+            self.ndb.division_index.add(division.division_bridge)
+            on_rollback(lambda: self.ndb.division_index.remove(division.division_bridge.pk))
+        fmsg.DivisionCreateMessage(source=enactor, faction=faction, division=division).send()
+        return division
+
+    def rename_division(self, session, division, new_name):
+        enactor = session.get_puppet_or_account()
+        division = self.find_division(division)
+        faction = division.faction
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        old_name = division.key
+        with self.unit_of_work():
+            division.rename(new_name)
+            self.ndb.division_index.update(division.division_bridge)
+            on_rollback(lambda: self.ndb.division_index.update(division.division_bridge))
+        fmsg.DivisionRenameMessage(source=enactor, faction=faction, division=division, old_name=old_name).send()
+
+    def delete_division(self, session, division, verify_name=None):
+        enactor = session.get_puppet_or_account()
+        division = self.find_division(division)
+        faction = division.faction
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        if not verify_name or not (division.key.lower() == verify_name.lower()):
+            raise ValueError("Name of the division must match the one provided to verify deletion.")
+        fmsg.DivisionDeleteMessage(source=enactor, faction=faction, division=division).send()
+        bridge_id = division.division_bridge.pk
+        with self.unit_of_work():
+            division.delete()
+            self.ndb.names.release_owner(bridge_id)
+            on_rollback(self.build_roster_index)
+            on_rollback(self.build_division_index)
+            self.ndb.division_index.remove(bridge_id)
+            self.ndb.roster_index.divisions.pop(bridge_id, None)
+
+    def assign_division(self, session, faction, character, division=None):
+        enactor = session.get_puppet_or_account()
+        faction = self.find_faction(faction)
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        division = self.find_division(division, faction=faction) if division else None
+        if division and division.division_bridge.db_faction_id != faction.faction_bridge.pk:
+            raise ValueError(f"{division.full_path()} is not a Division of {faction.full_path()}!")
+        membership = faction.membership(character.entity, create=False)
+        if not membership.db_member:
+            raise ValueError(f"{character} is not a member of {faction}!")
+        old_division_id = membership.db_division_id
+        with self.unit_of_work():
+            membership.db_division = division.division_bridge if division else None
+            mark_dirty(membership, 'db_division')
+            new_division_id = membership.db_division_id
+            self.ndb.roster_index.set_division(character.entity.id, old_division_id, new_division_id)
+            on_rollback(lambda: self.ndb.roster_index.set_division(character.entity.id, new_division_id,
+                                                                   old_division_id))
+        if division:
+            fmsg.DivisionAssignMessage(source=enactor, target=character, faction=faction, division=division).send()
+
+    def message_division(self, session, division, text):
+        enactor = session.get_puppet_or_account()
+        division = self.find_division(division)
+        faction = division.faction
+        if not (self.has_privilege(enactor, faction, 'manage') or self.is_supermember(faction, enactor)
+                or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        if not text:
+            raise ValueError("Nothing entered to send!")
+        fmsg.DivisionAnnounceMessage(source=enactor, faction=faction, division=division, text=text).send()
 
     def create_faction(self, session, name, description, parent=None):
         enactor = session.get_puppet_or_account()
         if not self.access(enactor, 'create', default='perm(Admin)'):
             raise ValueError("Permission denied.")
-        new_faction = self.ndb.faction_typeclass.create(key=name, description=description, parent=parent)
+        with self.unit_of_work():
+            new_faction = self.ndb.faction_typeclass.create_faction(name, parent=parent, description=description)
+            FactionClosure.objects.insert_node(new_faction.faction_bridge)
+            self.ndb.faction_index.add(new_faction.faction_bridge)
+            self.refresh_roster(new_faction)
+            on_rollback(lambda: self.ndb.roster_index.remove(new_faction.faction_bridge.pk))
+            on_rollback(lambda: self.ndb.faction_index.remove(new_faction.faction_bridge.pk))
+        self.ndb.events.emit(fev.FactionCreated(new_faction.faction_bridge.pk, new_faction.faction_bridge.db_parent_id))
         fmsg.FactionCreateMessage(source=enactor, faction=new_faction).send()
         return new_faction
 
+    def provision_factions(self, specs, session=None):
+        if session is not None:
+            enactor = session.get_puppet_or_account()
+            if not self.access(enactor, 'create', default='perm(Admin)'):
+                raise ValueError("Permission denied.")
+        return FactionProvisioner(self).provision(specs)
+
+    def export_factions(self, path, session=None):
+        if session is not None:
+            enactor = session.get_puppet_or_account()
+            if not self.access(enactor, 'admin'):
+                raise ValueError("Permission denied.")
+        chunk_size = getattr(settings, 'FACTION_EXPORT_CHUNK', 1000)
+        return FactionExporter(chunk_size=chunk_size).export(path)
+
+    def import_factions(self, path, session=None, entity_ids=None):
+        if session is not None:
+            enactor = session.get_puppet_or_account()
+            if not self.access(enactor, 'admin'):
+                raise ValueError("Permission denied.")
+        importer = FactionImporter(batch_size=getattr(settings, 'FACTION_IMPORT_BATCH', 500), entity_ids=entity_ids)
+        try:
+            return importer.load(path)
+        finally:
+            self.build_faction_index()
+            self.build_alliance_index()
+            self.build_division_index()
+            self.build_name_registry()
+            self.build_roster_index()
+            self.ndb.privileges.clear()
+            self.ndb.lock_cache.invalidate()
+            self.ndb.listing_cache.invalidate()
+
     def delete_faction(self, session, faction, verify_name=None):
         enactor = session.get_puppet_or_account()
         if not self.access(enactor, 'delete', default='perm(Admin)'):
@@ -65,8 +596,20 @@ class AthanorFactionController(AthanorGlobalScript):
             raise ValueError("Name of the faction must match the one provided to verify deletion.")
         if faction.children.all().count():
             raise ValueError("Cannot disband a faction that has sub-factions! Either delete them or relocate them first.")
+        if self.ndb.division_index.by_faction.get(faction.faction_bridge.pk):
+            raise ValueError("Cannot disband a faction that still has divisions! Delete them first.")
         fmsg.FactionDeleteMessage(source=enactor, faction=faction).send()
-        faction.delete()
+        bridge = faction.faction_bridge
+        with self.unit_of_work():
+            FactionClosure.objects.remove_node(bridge)
+            faction.delete()
+            self.ndb.names.release_owner(bridge.pk)
+            on_rollback(self.build_roster_index)
+            on_rollback(self.build_faction_index)
+            self.ndb.privileges.invalidate_faction(faction)
+            self.ndb.roster_index.remove(bridge.pk)
+            self.ndb.faction_index.remove(bridge)
+        self.ndb.events.emit(fev.FactionDeleted(bridge.pk))
 
     def rename_faction(self, session, faction, new_name):
         enactor = session.get_puppet_or_account()
@@ -74,7 +617,12 @@ class AthanorFactionController(AthanorGlobalScript):
         if not self.access(enactor, 'admin'):
             raise ValueError("Permission denied.")
         old_path = faction.full_path()
-        new_name = faction.rename(new_name)
+        old_name = faction.key
+        with self.unit_of_work():
+            faction.rename(new_name)
+            self.ndb.faction_index.update(faction.faction_bridge)
+            on_rollback(lambda: self.ndb.faction_index.update(faction.faction_bridge))
+        self.ndb.events.emit(fev.FactionRenamed(faction.faction_bridge.pk, old_name, faction.key))
         fmsg.FactionRenameMessage(source=enactor, faction=faction, old_path=old_path).send()
 
     def describe_faction(self, session, faction, new_description):
@@ -95,7 +643,10 @@ class AthanorFactionController(AthanorGlobalScript):
         if not self.access(enactor, 'admin'):
             raise ValueError("Permission denied.")
         old_tier = faction.tier
-        faction.tier = new_tier
+        with self.unit_of_work():
+            faction.tier = new_tier
+            self.ndb.faction_index.update(faction.faction_bridge)
+            on_rollback(lambda: self.ndb.faction_index.update(faction.faction_bridge))
         fmsg.FactionTierMessage(source=enactor, faction=faction, old_tier=old_tier, new_tier=new_tier).send()
 
     def move_faction(self, session, faction, new_root=None):
@@ -110,19 +661,34 @@ class AthanorFactionController(AthanorGlobalScript):
             raise ValueError("That doesn't make it go anywhere!")
         if new_root == faction.parent:
             raise ValueError("That doesn't make it go anywhere!")
-        if new_root is not None and faction in new_root.db.ancestors:
+        if new_root is not None and FactionClosure.objects.is_ancestor(faction.faction_bridge, new_root.faction_bridge):
             raise ValueError(f"Do you want {faction.full_path()} to be {new_root.full_path()}'s Grandpa and vice-versa? I don't.")
         old_path = faction.full_path()
-        faction.change_parent(new_root)
+        old_parent_id = faction.faction_bridge.db_parent_id
+        with self.unit_of_work():
+            faction.change_parent(new_root)
+            FactionClosure.objects.move_node(faction.faction_bridge)
+            self.relocate(faction.faction_bridge)
+            on_rollback(lambda: self.relocate(faction.faction_bridge))
+        self.ndb.events.emit(fev.FactionMoved(faction.faction_bridge.pk, old_parent_id,
+                                              faction.faction_bridge.db_parent_id))
         fmsg.FactionMoveMessage(source=enactor, faction=faction, faction_2=new_root, old_path=old_path).send()
 
+    def relocate(self, bridge):
+        self.ndb.roster_index.detach(bridge.pk)
+        self.ndb.faction_index.move(bridge)
+        self.ndb.roster_index.attach(bridge.pk)
+
     def set_abbreviation(self, session, faction, new_abbr):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
         if not self.access(enactor, 'admin'):
             raise ValueError("Permission denied.")
         old_abbr = faction.abbreviation
-        faction.abbreviation = new_abbr
+        with self.unit_of_work():
+            faction.abbreviation = new_abbr
+            self.ndb.faction_index.update(faction.faction_bridge)
+            on_rollback(lambda: self.ndb.faction_index.update(faction.faction_bridge))
         fmsg.FactionAbbreviationMessage(source=enactor, faction=faction, old_abbr=old_abbr).send()
 
     def set_lock(self, session, faction, new_lock):
@@ -130,67 +696,91 @@ class AthanorFactionController(AthanorGlobalScript):
         faction = self.find_faction(faction)
         if not new_lock:
             raise ValueError("New Lock string is empty!")
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
+        faction.locks.add(new_lock)
+        self.ndb.lock_cache.invalidate(faction)
         fmsg.FactionLockMessage(source=enactor, faction=faction, lockstring=new_lock).send()
 
     def config_faction(self, session, faction, new_config):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
 
     def create_privilege(self, session, faction, privilege, description):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         priv = faction.create_privilege(privilege)
         priv.db.desc = description
+        self.ndb.privileges.invalidate_faction(faction)
+        self.ndb.events.emit(fev.PrivilegeChanged(faction.faction_bridge.pk, priv.pk))
         fmsg.PrivilegeCreateMessage(source=enactor, faction=faction, privilege=priv.key).send()
 
     def delete_privilege(self, session, faction, privilege, verify_name):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         priv = faction.find_privilege(privilege)
         if verify_name is None or not (priv.key.lower() == verify_name.lower()):
             raise ValueError("Privilege name and input must match!")
         fmsg.PrivilegeDeleteMessage(source=enactor, faction=faction, privilege=priv.key).send()
+        privilege_id = priv.pk
         faction.delete_privilege(priv)
+        self.ndb.privileges.invalidate_faction(faction)
+        self.ndb.events.emit(fev.PrivilegeChanged(faction.faction_bridge.pk, privilege_id))
 
     def rename_privilege(self, session, faction, privilege, new_name):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         priv = faction.partial_privilege(privilege)
         old_name = priv.key
         priv.rename(new_name)
+        self.ndb.privileges.invalidate_faction(faction)
+        self.ndb.events.emit(fev.PrivilegeChanged(faction.faction_bridge.pk, priv.pk))
         fmsg.PrivilegeRenameMessage(source=enactor, faction=faction, old_name=old_name, privilege=priv.key).send()
 
     def describe_privilege(self, session, faction, privilege, new_description):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         priv = faction.partial_privilege(privilege)
         priv.db.desc = new_description
         fmsg.PrivilegeDescribeMessage(source=enactor, faction=faction, privilege=priv.key).send()
 
+    def match_privileges(self, faction, names):
+        candidates = list(faction.privileges.all())
+        found = list()
+        for name in names:
+            if not (priv := partial_match(name, candidates)):
+                raise ValueError(f"Privilege {name} not found!")
+            if priv not in found:
+                found.append(priv)
+        return found
+
     def assign_privilege(self, session, faction, role, privileges):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
         if not privileges:
             raise ValueError("No privileges entered to dole out!")
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.partial_role(role)
-        privileges = set([faction.partial_privilege(priv) for priv in privileges])
-        for priv in privileges:
-            role.add_privilege(priv)
-        privilege_names = ', '.join([str(p) for p in privileges])
+        privileges = self.match_privileges(faction, privileges)
+        with transaction.atomic():
+            current = set(role.privileges.all())
+            if not (changed := [priv for priv in privileges if priv not in current]):
+                raise ValueError(f"Role {role} already has those privileges!")
+            role.privileges.add(*changed)
+        self.ndb.privileges.invalidate_roles(faction, [role])
+        self.ndb.events.emit(fev.RoleChanged(faction.faction_bridge.pk, role.pk))
+        privilege_names = ', '.join([str(p) for p in changed])
         fmsg.RoleAssignPrivileges(source=enactor, faction=faction, role=role.key, privileges=privilege_names).send()
 
     def revoke_privilege(self, session, faction, role, privileges):
@@ -198,56 +788,66 @@ class AthanorFactionController(AthanorGlobalScript):
         faction = self.find_faction(faction)
         if not privileges:
             raise ValueError("No privileges entered to revoke!")
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.partial_role(role)
-        privileges = set([faction.partial_privilege(priv) for priv in privileges])
-        for priv in privileges:
-            role.remove_privilege(priv)
-        privilege_names = ', '.join([str(p) for p in privileges])
+        privileges = self.match_privileges(faction, privileges)
+        with transaction.atomic():
+            current = set(role.privileges.all())
+            if not (changed := [priv for priv in privileges if priv in current]):
+                raise ValueError(f"Role {role} has none of those privileges!")
+            role.privileges.remove(*changed)
+        self.ndb.privileges.invalidate_roles(faction, [role])
+        self.ndb.events.emit(fev.RoleChanged(faction.faction_bridge.pk, role.pk))
+        privilege_names = ', '.join([str(p) for p in changed])
         fmsg.RoleRevokePrivileges(source=enactor, faction=faction, role=role.key, privileges=privilege_names).send()
 
     def create_role(self, session, faction, role, description):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.create_role(role)
         role.db.desc = description
+        self.ndb.events.emit(fev.RoleChanged(faction.faction_bridge.pk, role.pk))
         fmsg.RoleCreateMessage(source=enactor, faction=faction, role=role.send())
 
     def delete_role(self, session, faction, role, verify_name):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.partial_role(role)
         if verify_name is None or not role.key.lower() == verify_name.lower():
             raise ValueError("Role name and input must match!")
         fmsg.RoleDeleteMessage(source=enactor, faction=faction, role=role.key).send()
+        self.ndb.privileges.invalidate_roles(faction, [role])
+        role_id = role.pk
         faction.delete_role(role)
+        self.ndb.events.emit(fev.RoleChanged(faction.faction_bridge.pk, role_id))
 
     def rename_role(self, session, faction, role, new_name):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.partial_role(role)
         old_name = role.key
         role.rename(new_name)
+        self.ndb.events.emit(fev.RoleChanged(faction.faction_bridge.pk, role.pk))
         fmsg.RoleRenameMessage(source=enactor, faction=faction, role=role.key, old_name=old_name).send()
 
     def describe_role(self, session, faction, role, new_description):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        if not (faction.is_supermember(enactor) or self.access(enactor, 'admin')):
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
             raise ValueError("Permission denied.")
         role = faction.partial_role(role)
         role.db.desc = new_description
         fmsg.RoleDescribeMessage(source=enactor, faction=faction, role=role.key).send()
 
     def direct_add_member(self, session, faction, character):
-        link = self.add_member(session, faction, character.entity)
+        self.add_member(session, faction, character.entity)
 
     def kick_member(self, session, faction, character):
         self.remove_member(session, faction, character.entity)
@@ -258,44 +858,73 @@ class AthanorFactionController(AthanorGlobalScript):
     def add_member(self, session, faction, entity):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(entity)
-        if link.member:
+        membership = faction.membership(entity)
+        if membership.db_member:
             raise ValueError(f"{entity} is already a member of {faction}!")
-        link.member = True
-        return link
+        with self.unit_of_work():
+            membership.db_member = True
+            membership.db_rank = faction.default_rank()
+            membership.save(update_fields=['db_member', 'db_rank'])
+            refresh_on_rollback(membership, 'db_member', 'db_rank')
+            self.ndb.roster_index.add(faction.faction_bridge.pk, entity)
+            self.invalidate_member_access(faction, entity)
+            on_rollback(lambda: self.invalidate_member_access(faction, entity))
+            on_rollback(lambda: self.ndb.roster_index.discard(faction.faction_bridge.pk, entity))
+        self.ndb.events.emit(fev.MemberAdded(faction.faction_bridge.pk, entity.id))
+        return membership
 
     def remove_member(self, session, faction, entity):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(entity, create=False)
-        link.member = False
-        link.is_supermember = False
-        link.roles.all().delete()
-        del link.db.title
-        if not link.db.reputation:
-            link.delete()
+        membership = faction.membership(entity, create=False)
+        division_id = membership.db_division_id
+        with self.unit_of_work():
+            if (link := faction.member_link(entity)):
+                link.roles.all().delete()
+            membership.db_member = False
+            membership.db_supermember = False
+            membership.db_title = None
+            membership.db_rank = None
+            membership.db_division = None
+            if membership.is_vacant():
+                membership.delete()
+            else:
+                membership.save(update_fields=['db_member', 'db_supermember', 'db_title', 'db_rank', 'db_division'])
+                refresh_on_rollback(membership, 'db_member', 'db_supermember', 'db_title', 'db_rank', 'db_division')
+            self.ndb.roster_index.set_division(entity.id, old_division_id=division_id)
+            self.ndb.roster_index.discard(faction.faction_bridge.pk, entity)
+            self.invalidate_member_access(faction, entity)
+            on_rollback(lambda: self.invalidate_member_access(faction, entity))
+            on_rollback(lambda: self.ndb.roster_index.set_division(entity.id, new_division_id=division_id))
+            on_rollback(lambda: self.ndb.roster_index.add(faction.faction_bridge.pk, entity))
+        self.ndb.events.emit(fev.MemberRemoved(faction.faction_bridge.pk, entity.id))
 
     def send_application(self, session, faction, character, pitch):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(character)
-        if link.is_applying:
+        membership = faction.membership(character.entity)
+        if membership.db_applying:
             raise ValueError("You already applied!")
         if not pitch:
             raise ValueError("Must include a pitch!")
-        link.is_applying = True
-        link.db.application_pitch = pitch
+        membership.db_applying = True
+        membership.db_application_pitch = pitch
+        membership.db_applied_at = timezone.now()
+        membership.save(update_fields=['db_applying', 'db_application_pitch', 'db_applied_at'])
 
     def withdraw_application(self, session, faction, character):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(character, create=False)
-        if not link.is_applying:
-            raise ValueError("You already applied!")
-        link.is_applying = False
-        del link.db.application_pitch
-        if not link.db.reputation:
-            link.delete()
+        membership = faction.membership(character.entity, create=False)
+        if not membership.db_applying:
+            raise ValueError("You have not applied!")
+        membership.db_applying = False
+        membership.db_application_pitch = None
+        membership.db_applied_at = None
+        if membership.is_vacant():
+            membership.delete()
+        else:
+            membership.save(update_fields=['db_applying', 'db_application_pitch', 'db_applied_at'])
 
     def accept_application(self, session, faction, character):
         pass
@@ -306,7 +935,7 @@ class AthanorFactionController(AthanorGlobalScript):
     def uninvite_character(self, session, faction, character):
         pass
 
-    def accept_invite(self, session, link):
+    def accept_invite(self, session, membership):
         pass
 
     def assign_role(self, session, faction, entity, role):
@@ -315,6 +944,7 @@ class AthanorFactionController(AthanorGlobalScript):
         link = faction.link(entity)
         role = faction.find_role(role)
         link.add_role(role)
+        self.ndb.privileges.invalidate_member(faction, entity)
 
     def revoke_role(self, session, faction, entity, role):
         enactor = session.get_puppet_or_account()
@@ -322,15 +952,34 @@ class AthanorFactionController(AthanorGlobalScript):
         link = faction.link(entity)
         role = faction.find_role(role)
         link.remove_role(role)
+        self.ndb.privileges.invalidate_member(faction, entity)
+
+    def rank_member(self, session, faction, character, number):
+        enactor = session.get_puppet_or_account()
+        faction = self.find_faction(faction)
+        if not (self.is_supermember(faction, enactor) or self.access(enactor, 'admin')):
+            raise ValueError("Permission denied.")
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise ValueError("Rank must be a number!")
+        rank = faction.find_rank(number)
+        membership = faction.find_member(character)
+        membership.db_rank = rank.db_rank_value
+        mark_dirty(membership, 'db_rank')
+        self.invalidate_member_access(faction, character.entity)
 
     def title_member(self, session, faction, character, new_title):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(character.entity)
-        link.db.title = new_title
+        membership = faction.membership(character.entity, create=False)
+        membership.db_title = new_title
+        mark_dirty(membership, 'db_title')
 
     def set_supermember(self, session, faction, character, new_status):
         enactor = session.get_puppet_or_account()
         faction = self.find_faction(faction)
-        link = faction.link(character.entity)
-        link.is_supermember = new_status
+        membership = faction.membership(character.entity, create=False)
+        membership.db_supermember = bool(new_status)
+        mark_dirty(membership, 'db_supermember')
+        self.invalidate_member_access(faction, character.entity)
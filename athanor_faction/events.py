@@ -0,0 +1,138 @@
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from evennia.utils.logger import log_trace
+from twisted.internet import reactor
+
+from athanor_faction.unitofwork import unit_of_work
+
+
+@dataclass(frozen=True)
+class FactionEvent:
+    faction_id: int
+
+
+@dataclass(frozen=True)
+class FactionCreated(FactionEvent):
+    parent_id: int
+
+
+@dataclass(frozen=True)
+class FactionRenamed(FactionEvent):
+    old_name: str
+    new_name: str
+
+
+@dataclass(frozen=True)
+class FactionMoved(FactionEvent):
+    old_parent_id: int
+    new_parent_id: int
+
+
+@dataclass(frozen=True)
+class FactionDeleted(FactionEvent):
+    pass
+
+
+@dataclass(frozen=True)
+class RoleChanged(FactionEvent):
+    role_id: int
+
+
+@dataclass(frozen=True)
+class PrivilegeChanged(FactionEvent):
+    privilege_id: int
+
+
+@dataclass(frozen=True)
+class MemberAdded(FactionEvent):
+    entity_id: int
+
+
+@dataclass(frozen=True)
+class MemberRemoved(FactionEvent):
+    entity_id: int
+
+
+class FactionEventBus:
+    """
+    In-process dispatch of typed Faction mutation events to caches, counters and indexes.
+
+    Handlers subscribe to an event class and receive it and its subclasses. Synchronous
+    handlers run as soon as the events are dispatched; deferred handlers are queued and run
+    together on the next reactor turn, like fan-out delivery.
+
+    Events emitted inside a unit of work are coalesced: identical events collapse into one,
+    and the batch is dispatched in emission order once the transaction commits, or dropped
+    if it rolls back. Since every command runs in a unit of work, subscribers see at most one
+    batch per command. Outside a unit of work events are dispatched immediately.
+    """
+
+    def __init__(self):
+        self.handlers = defaultdict(list)
+        self.routes = dict()
+        self.pending = dict()
+        self.unit_atomic = None
+        self.queued = list()
+        self.scheduled = False
+        self.emitted = 0
+        self.dispatched = 0
+
+    def subscribe(self, event_type, handler, deferred=False):
+        self.handlers[event_type].append((handler, deferred))
+        self.routes.clear()
+
+    def unsubscribe(self, event_type, handler):
+        self.handlers[event_type] = [entry for entry in self.handlers[event_type] if entry[0] != handler]
+        self.routes.clear()
+
+    def route(self, event_type):
+        if (found := self.routes.get(event_type)) is None:
+            sync, deferred = list(), list()
+            for cls in event_type.__mro__:
+                for handler, is_deferred in self.handlers.get(cls, tuple()):
+                    (deferred if is_deferred else sync).append(handler)
+            found = self.routes[event_type] = (tuple(sync), tuple(deferred))
+        return found
+
+    def emit(self, event):
+        self.emitted += 1
+        unit = unit_of_work()
+        if not unit.active:
+            self.dispatch((event,))
+            return
+        if self.unit_atomic is not unit.atomic:
+            self.unit_atomic = unit.atomic
+            transaction.on_commit(self.flush)
+            unit.on_rollback(self.discard)
+        self.pending[event] = None
+
+    def flush(self):
+        events, self.pending, self.unit_atomic = list(self.pending), dict(), None
+        self.dispatch(events)
+
+    def discard(self):
+        self.pending, self.unit_atomic = dict(), None
+
+    def dispatch(self, events):
+        for event in events:
+            self.dispatched += 1
+            sync, deferred = self.route(event.__class__)
+            for handler in sync:
+                try:
+                    handler(event)
+                except Exception:
+                    log_trace()
+            self.queued.extend((handler, event) for handler in deferred)
+        if self.queued and not self.scheduled:
+            self.scheduled = True
+            reactor.callLater(0, self.run_deferred)
+
+    def run_deferred(self):
+        queued, self.queued, self.scheduled = self.queued, list(), False
+        for handler, event in queued:
+            try:
+                handler(event)
+            except Exception:
+                log_trace()
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from twisted.internet import reactor
+
+
+class FactionFanout:
+    """
+    Delivers Faction broadcasts from the Roster Index's session sets.
+
+    Recipients are resolved as a deduplicated union of entity ids, every distinct text is
+    rendered once by the caller, and output is queued per session and flushed on the next
+    reactor turn in bounded chunks, so one session receives one write per flush no matter
+    how many broadcasts it was part of.
+    """
+    chunk_size = 250
+
+    def __init__(self, roster):
+        self.roster = roster
+        self.pending = defaultdict(list)
+        self.scheduled = False
+
+    def recipients(self, bridge_ids, direct=True, exclude=None):
+        found = set()
+        for bridge_id in bridge_ids:
+            found.update(self.roster.online_entities(bridge_id, direct))
+        if exclude:
+            found.difference_update(exclude)
+        return found
+
+    def alliance_recipients(self, alliance_ids, exclude=None):
+        found = set()
+        for alliance_id in alliance_ids:
+            found.update(self.roster.alliance_online.get(alliance_id, tuple()))
+        if exclude:
+            found.difference_update(exclude)
+        return found
+
+    def sessions(self, entity_ids):
+        found = set()
+        for entity_id in entity_ids:
+            found.update(self.roster.sessions.get(entity_id, tuple()))
+        return found
+
+    def deliver(self, sessions, text):
+        for session in sessions:
+            self.pending[session].append(text)
+        if self.pending and not self.scheduled:
+            self.scheduled = True
+            reactor.callLater(0, self.flush)
+
+    def flush(self):
+        batch = list()
+        while self.pending and len(batch) < self.chunk_size:
+            batch.append(self.pending.popitem())
+        for session, lines in batch:
+            session.msg(text='\n'.join(lines))
+        if self.pending:
+            reactor.callLater(0, self.flush)
+        else:
+            self.scheduled = False
@@ -1,13 +1,61 @@
 import re
 
+from evennia import GLOBAL_SCRIPTS
+from evennia.objects.models import ObjectDB
 from evennia.utils.ansi import ANSIString
 
 from athanor.gamedb.objects import AthanorObject
-from athanor_faction.models import FactionBridge
+from athanor_faction.models import AllianceBridge, FactionBridge, DivisionBridge, FactionMembership
+from athanor_faction.unitofwork import mark_dirty, refresh_on_rollback
 
 
 class AthanorAlliance(AthanorObject):
-    pass
+
+    @classmethod
+    def clean_name(cls, key):
+        key = ANSIString(key)
+        clean_key = str(key.clean())
+        if '|' in clean_key:
+            raise ValueError("Malformed ANSI in Alliance Name.")
+        return key, clean_key
+
+    @classmethod
+    def create_alliance(cls, key, abbr=None, **kwargs):
+        key, clean_key = cls.clean_name(key)
+        registry = GLOBAL_SCRIPTS.faction.ndb.names
+        with registry.reserve(('alliance_name', None, clean_key), ('alliance_abbreviation', None, abbr)) as reserved:
+            obj, errors = cls.create(clean_key, **kwargs)
+            if not obj:
+                raise ValueError(errors)
+            obj.create_bridge(key, clean_key, abbr)
+            reserved.commit(obj.pk)
+        return obj
+
+    def create_bridge(self, key, clean_key, abbr=None):
+        if hasattr(self, 'alliance_bridge'):
+            return
+        AllianceBridge.objects.create(db_object=self, db_name=clean_key, db_iname=clean_key.lower(), db_cname=key,
+                                      db_abbreviation=abbr, db_iabbreviation=abbr.lower() if abbr else None)
+
+    def rename(self, key):
+        key, clean_key = self.clean_name(key)
+        bridge = self.alliance_bridge
+        with GLOBAL_SCRIPTS.faction.ndb.names.replace('alliance_name', bridge.pk, clean_key) as reserved:
+            self.key = clean_key
+            refresh_on_rollback(self, 'db_key')
+            bridge.db_name = clean_key
+            bridge.db_iname = clean_key.lower()
+            bridge.db_cname = key
+            mark_dirty(bridge, 'db_name', 'db_iname', 'db_cname')
+            reserved.commit(bridge.pk)
+
+    @property
+    def abbreviation(self):
+        return self.alliance_bridge.db_abbreviation
+
+    def factions(self):
+        return [bridge.db_object for bridge in self.alliance_bridge.factions.select_related('db_object')
+                .order_by('-db_tier', 'db_iname')]
 
 
 class AthanorFaction(AthanorObject):
@@ -22,19 +70,77 @@ class AthanorFaction(AthanorObject):
     re_name = re.compile(r"")
     lockstring = ""
 
-    def rename(self, key):
+    def access(self, accessing_obj, access_type='read', default=False, no_superuser_bypass=False, **kwargs):
+        result = GLOBAL_SCRIPTS.faction.faction_access(self, accessing_obj, access_type, default=default,
+                                                       no_superuser_bypass=no_superuser_bypass)
+        self.at_access(result, accessing_obj, access_type, **kwargs)
+        return result
+
+    @classmethod
+    def clean_name(cls, key):
         key = ANSIString(key)
         clean_key = str(key.clean())
         if '|' in clean_key:
             raise ValueError("Malformed ANSI in Faction Name.")
+        return key, clean_key
+
+    def rename(self, key):
+        key, clean_key = self.clean_name(key)
+        bridge = self.faction_bridge
+        with GLOBAL_SCRIPTS.faction.ndb.names.replace('faction_name', bridge.pk, clean_key) as reserved:
+            self.key = clean_key
+            refresh_on_rollback(self, 'db_key')
+            bridge.db_name = clean_key
+            bridge.db_iname = clean_key.lower()
+            bridge.db_cname = key
+            mark_dirty(bridge, 'db_name', 'db_iname', 'db_cname')
+            reserved.commit(bridge.pk)
+
+    @property
+    def parent(self):
+        parent = self.faction_bridge.db_parent
+        return parent.db_object if parent else None
+
+    def full_path(self):
+        return GLOBAL_SCRIPTS.faction.ndb.faction_index.path(self.faction_bridge)
+
+    def change_parent(self, new_parent):
+        bridge = self.faction_bridge
+        bridge.db_parent = new_parent.faction_bridge if new_parent else None
+        mark_dirty(bridge, 'db_parent')
+
+    @property
+    def alliance(self):
+        alliance = self.faction_bridge.db_alliance
+        return alliance.db_object if alliance else None
+
+    def change_alliance(self, new_alliance):
+        bridge = self.faction_bridge
+        bridge.db_alliance = new_alliance.alliance_bridge if new_alliance else None
+        mark_dirty(bridge, 'db_alliance')
+
+    @property
+    def tier(self):
+        return self.faction_bridge.db_tier
+
+    @tier.setter
+    def tier(self, value):
         bridge = self.faction_bridge
-        parent = bridge.db_parent
-        if FactionBridge.objects.filter(db_iname=clean_key.lower(), db_parent=parent).exclude(id=bridge).count():
-            raise ValueError("Name conflicts with another Faction with the same Parent.")
-        self.key = clean_key
-        bridge.db_name = clean_key
-        bridge.db_iname = clean_key.lower()
-        bridge.db_cname = key
+        bridge.db_tier = int(value)
+        mark_dirty(bridge, 'db_tier')
+
+    @property
+    def abbreviation(self):
+        return self.faction_bridge.db_abbreviation
+
+    @abbreviation.setter
+    def abbreviation(self, value):
+        bridge = self.faction_bridge
+        with GLOBAL_SCRIPTS.faction.ndb.names.replace('faction_abbreviation', bridge.pk, value) as reserved:
+            bridge.db_abbreviation = value or None
+            bridge.db_iabbreviation = value.lower() if value else None
+            mark_dirty(bridge, 'db_abbreviation', 'db_iabbreviation')
+            reserved.commit(bridge.pk)
 
     def create_bridge(self, parent, key, clean_key, abbr=None, tier=0):
         if hasattr(self, 'faction_bridge'):
@@ -50,18 +156,16 @@ class AthanorFaction(AthanorObject):
 
     @classmethod
     def create_faction(cls, key, parent=None, abbr=None, tier=0, **kwargs):
-        key = ANSIString(key)
-        clean_key = str(key.clean())
-        if '|' in clean_key:
-            raise ValueError("Malformed ANSI in Faction Name.")
-        if FactionBridge.objects.filter(db_iname=clean_key.lower(), db_parent=parent).count():
-            raise ValueError("Name conflicts with another Faction with the same Parent.")
-        obj, errors = cls.create(clean_key, **kwargs)
-        if obj:
-            obj.create_bridge(parent, key, clean_key, abbr, tier)
-            obj.setup_faction()
-        else:
-            raise ValueError(errors)
+        key, clean_key = cls.clean_name(key)
+        registry = GLOBAL_SCRIPTS.faction.ndb.names
+        with registry.reserve(('faction_name', None, clean_key), ('faction_abbreviation', None, abbr)) as reserved:
+            obj, errors = cls.create(clean_key, **kwargs)
+            if obj:
+                obj.create_bridge(parent, key, clean_key, abbr, tier)
+                obj.setup_faction()
+            else:
+                raise ValueError(errors)
+            reserved.commit(obj.pk)
         return obj
 
     def setup_faction(self):
@@ -97,10 +201,19 @@ class AthanorFaction(AthanorObject):
         if check_admin and character.is_admin():
             return 0
         found = self.find_member(character)
-        return found.db_rank.db_rank_number
+        return found.db_rank if found.db_rank is not None else self.default_rank()
+
+    def default_rank(self):
+        return self.faction_bridge.ranks.order_by('-db_rank_value').values_list('db_rank_value', flat=True).first()
+
+    def member_rank(self, membership):
+        number = membership.db_rank if membership.db_rank is not None else self.default_rank()
+        if number is None:
+            return None
+        return self.faction_bridge.ranks.filter(db_rank_value=number).first()
 
     def find_rank(self, number):
-        found = self.faction_bridge.ranks.filter(db_rank_number=number).first()
+        found = self.faction_bridge.ranks.filter(db_rank_value=number).first()
         if not found:
             raise ValueError(f"{self} does not have Rank {number}!")
         return found
@@ -108,16 +221,102 @@ class AthanorFaction(AthanorObject):
     def rename_rank(self, number, new_name):
         found = self.find_rank(number)
         found.db_name = new_name
+        mark_dirty(found, 'db_name')
 
     def find_member(self, character):
-        if not (found := character.factions.filter(db_faction=self.faction_bridge)):
+        entity = getattr(character, 'entity', character)
+        if not (found := FactionMembership.objects.filter(db_faction=self.faction_bridge, db_entity=entity,
+                                                          db_member=True).first()):
             raise ValueError(f"{character} is not a member of {self}!")
         return found
 
+    def membership(self, entity, create=True):
+        bridge = self.faction_bridge
+        if create:
+            found, created = FactionMembership.objects.get_or_create(db_faction=bridge, db_entity=entity)
+            return found
+        if not (found := FactionMembership.objects.filter(db_faction=bridge, db_entity=entity).first()):
+            raise ValueError(f"{entity} has no standing with {self}!")
+        return found
+
+    def member_link(self, entity):
+        """
+        The legacy link holding entity's role assignments, or None if it has none.
+        """
+        try:
+            return self.link(entity, create=False) or None
+        except ValueError:
+            return None
+
+    def member_entities(self):
+        return [found.db_entity for found in FactionMembership.objects.filter(
+            db_faction=self.faction_bridge, db_member=True).select_related('db_entity')]
+
+    def subtree_members(self, connected=False):
+        """
+        Distinct member entities of this Faction and all of its descendants, in one query
+        joined through the closure table. connected=True keeps only the entities the Roster
+        Index has online.
+        """
+        bridge = self.faction_bridge
+        found = ObjectDB.objects.filter(faction_memberships__db_faction__ancestor_links__db_ancestor=bridge,
+                                        faction_memberships__db_member=True).distinct()
+        if not connected:
+            return list(found)
+        online = GLOBAL_SCRIPTS.faction.ndb.roster_index.connected
+        return [entity for entity in found if entity.id in online]
+
+    def applications(self):
+        return FactionMembership.objects.filter(db_faction=self.faction_bridge,
+                                                db_applying=True).select_related('db_entity')
+
     def title_member(self, character, new_title):
         found = self.find_member(character)
         found.db_title = new_title
+        mark_dirty(found, 'db_title')
 
 
 class AthanorDivision(AthanorObject):
-    pass
+
+    @classmethod
+    def clean_name(cls, key):
+        key = ANSIString(key)
+        clean_key = str(key.clean())
+        if '|' in clean_key:
+            raise ValueError("Malformed ANSI in Division Name.")
+        if '/' in clean_key:
+            raise ValueError("Division Names cannot contain /.")
+        return key, clean_key
+
+    @classmethod
+    def create_division(cls, faction, key, **kwargs):
+        key, clean_key = cls.clean_name(key)
+        bridge = faction.faction_bridge
+        with GLOBAL_SCRIPTS.faction.ndb.names.reserve(('division_name', bridge.pk, clean_key)) as reserved:
+            obj, errors = cls.create(clean_key, **kwargs)
+            if not obj:
+                raise ValueError(errors)
+            DivisionBridge.objects.create(db_object=obj, db_faction=bridge, db_name=clean_key,
+                                          db_iname=clean_key.lower(), db_cname=key)
+            reserved.commit(obj.pk)
+        return obj
+
+    @property
+    def faction(self):
+        return self.division_bridge.db_faction.db_object
+
+    def full_path(self):
+        return f"{self.faction.full_path()}/{self.division_bridge.db_name}"
+
+    def rename(self, key):
+        key, clean_key = self.clean_name(key)
+        bridge = self.division_bridge
+        registry = GLOBAL_SCRIPTS.faction.ndb.names
+        with registry.replace('division_name', bridge.pk, clean_key, scope=bridge.db_faction_id) as reserved:
+            self.key = clean_key
+            refresh_on_rollback(self, 'db_key')
+            bridge.db_name = clean_key
+            bridge.db_iname = clean_key.lower()
+            bridge.db_cname = key
+            mark_dirty(bridge, 'db_name', 'db_iname', 'db_cname')
+            reserved.commit(bridge.pk)
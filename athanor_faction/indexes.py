@@ -0,0 +1,471 @@
+from collections import defaultdict, Counter
+
+_LOOKUP = object()
+
+
+class _PrefixNode:
+    __slots__ = ('children', 'keys', 'terminal', 'best')
+
+    def __init__(self):
+        self.children = dict()
+        self.keys = set()
+        self.terminal = set()
+        self.best = None
+
+
+class PrefixIndex:
+    """
+    Character trie over lowercased strings. Every node remembers the ids stored beneath it
+    and caches the best-ranked one, so a prefix lookup costs O(len(prefix)).
+    """
+
+    def __init__(self, rank):
+        self.rank = rank
+        self.root = _PrefixNode()
+
+    def __len__(self):
+        return len(self.root.keys)
+
+    def add(self, text, key_id):
+        node = self.root
+        self._offer(node, key_id)
+        for char in text:
+            node = node.children.setdefault(char, _PrefixNode())
+            self._offer(node, key_id)
+        node.terminal.add(key_id)
+
+    def _offer(self, node, key_id):
+        node.keys.add(key_id)
+        if node.best is not None and self.rank(key_id) < self.rank(node.best):
+            node.best = key_id
+
+    def remove(self, text, key_id):
+        path = [self.root]
+        for char in text:
+            if not (node := path[-1].children.get(char)):
+                return
+            path.append(node)
+        path[-1].terminal.discard(key_id)
+        for depth, node in enumerate(path):
+            node.keys.discard(key_id)
+            if node.best == key_id:
+                node.best = None
+            if depth and not node.keys:
+                del path[depth - 1].children[text[depth - 1]]
+                break
+
+    def _locate(self, text):
+        node = self.root
+        for char in text:
+            if not (node := node.children.get(char)):
+                return None
+        return node
+
+    def exact(self, text):
+        if not (node := self._locate(text)) or not node.terminal:
+            return None
+        return min(node.terminal, key=self.rank)
+
+    def prefix(self, text):
+        if not (node := self._locate(text)) or not node.keys:
+            return None
+        if node.best is None:
+            node.best = min(node.keys, key=self.rank)
+        return node.best
+
+
+class FactionTreeIndex:
+    """
+    In-memory mirror of the Faction hierarchy, keyed by FactionBridge id.
+
+    Built once by the Faction Controller and kept up to date by its mutators, so that
+    resolving paths like Empire/Navy/Fleet never has to touch the database.
+    """
+
+    def __init__(self):
+        self.bridges = dict()
+        self.parents = dict()
+        self.children = defaultdict(set)
+        self.names = dict()
+        self.abbreviations = dict()
+        self.paths = dict()
+        self.name_prefixes = dict()
+        self.abbreviation_prefixes = dict()
+
+    def clear(self):
+        self.bridges.clear()
+        self.parents.clear()
+        self.children.clear()
+        self.names.clear()
+        self.abbreviations.clear()
+        self.paths.clear()
+        self.name_prefixes.clear()
+        self.abbreviation_prefixes.clear()
+
+    def build(self, bridges):
+        self.clear()
+        for bridge in bridges:
+            self._store(bridge)
+        for root_id in list(self.children[None]):
+            self._refresh_paths(root_id)
+
+    def _store(self, bridge):
+        self.bridges[bridge.pk] = bridge
+        self.parents[bridge.pk] = bridge.db_parent_id
+        self.children[bridge.db_parent_id].add(bridge.pk)
+        self.names[bridge.pk] = bridge.db_iname
+        self.abbreviations[bridge.pk] = bridge.db_iabbreviation
+        self._index_prefixes(bridge.pk)
+
+    def _prefixes(self, store, parent_id, field):
+        if (found := store.get(parent_id)) is None:
+            found = PrefixIndex(lambda i: (len(field[i]), self.sort_key(i)))
+            store[parent_id] = found
+        return found
+
+    def _index_prefixes(self, bridge_id):
+        parent_id = self.parents[bridge_id]
+        self._prefixes(self.name_prefixes, parent_id, self.names).add(self.names[bridge_id], bridge_id)
+        if (abbr := self.abbreviations[bridge_id]):
+            self._prefixes(self.abbreviation_prefixes, parent_id, self.abbreviations).add(abbr, bridge_id)
+
+    def _unindex_prefixes(self, bridge_id):
+        parent_id = self.parents[bridge_id]
+        if (names := self.name_prefixes.get(parent_id)):
+            names.remove(self.names[bridge_id], bridge_id)
+        if (abbr := self.abbreviations[bridge_id]) and (abbrs := self.abbreviation_prefixes.get(parent_id)):
+            abbrs.remove(abbr, bridge_id)
+
+    def _refresh_paths(self, bridge_id):
+        stack = [bridge_id]
+        while stack:
+            current = stack.pop()
+            name = self.bridges[current].db_name
+            parent_id = self.parents[current]
+            self.paths[current] = f"{self.paths[parent_id]}/{name}" if parent_id is not None else name
+            stack.extend(self.children.get(current, tuple()))
+
+    def add(self, bridge):
+        self._store(bridge)
+        self._refresh_paths(bridge.pk)
+
+    def remove(self, bridge):
+        bridge_id = bridge.pk if hasattr(bridge, 'pk') else bridge
+        if bridge_id not in self.bridges:
+            return
+        self._unindex_prefixes(bridge_id)
+        self.children[self.parents.pop(bridge_id)].discard(bridge_id)
+        self.children.pop(bridge_id, None)
+        self.bridges.pop(bridge_id)
+        self.names.pop(bridge_id)
+        self.abbreviations.pop(bridge_id)
+        self.paths.pop(bridge_id)
+
+    def update(self, bridge):
+        self._unindex_prefixes(bridge.pk)
+        self.children[self.parents[bridge.pk]].discard(bridge.pk)
+        self._store(bridge)
+        self._refresh_paths(bridge.pk)
+
+    def move(self, bridge):
+        self.update(bridge)
+
+    def path(self, bridge):
+        return self.paths[bridge.pk if hasattr(bridge, 'pk') else bridge]
+
+    def ancestors(self, bridge):
+        current = self.parents.get(bridge.pk if hasattr(bridge, 'pk') else bridge)
+        found = list()
+        while current is not None:
+            found.append(current)
+            current = self.parents[current]
+        return found
+
+    def sort_key(self, bridge_id):
+        bridge = self.bridges[bridge_id]
+        if self.parents[bridge_id] is None:
+            return -bridge.db_tier, bridge.db_name
+        return 0, bridge.db_name
+
+    def ordered_children(self, parent=None):
+        parent_id = parent.pk if hasattr(parent, 'pk') else parent
+        return [self.bridges[i] for i in sorted(self.children.get(parent_id, tuple()), key=self.sort_key)]
+
+    def match(self, text, parent=None):
+        text = text.lower()
+        parent_id = parent.pk if hasattr(parent, 'pk') else parent
+        indexes = [found for found in (self.name_prefixes.get(parent_id), self.abbreviation_prefixes.get(parent_id))
+                   if found]
+        for lookup in ('exact', 'prefix'):
+            for index in indexes:
+                if (found := getattr(index, lookup)(text)) is not None:
+                    return self.bridges[found]
+        return None
+
+    def find(self, search_text):
+        search_tree = [text.strip() for text in search_text.split('/')] if '/' in search_text else [search_text]
+        found = None
+        for srch in search_tree:
+            found = self.match(srch, found)
+            if not found:
+                raise ValueError(f"Faction {srch} not found!")
+        return found
+
+
+class DivisionIndex:
+    """
+    In-memory map of DivisionBridges keyed by (faction id, iname), mirroring the table's
+    unique_together, plus each Faction's division ids for listing and prefix matching.
+    """
+
+    def __init__(self):
+        self.bridges = dict()
+        self.names = dict()
+        self.inames = dict()
+        self.by_faction = defaultdict(set)
+
+    def build(self, bridges):
+        self.bridges.clear()
+        self.names.clear()
+        self.inames.clear()
+        self.by_faction.clear()
+        for bridge in bridges:
+            self.add(bridge)
+
+    def add(self, bridge):
+        self.bridges[bridge.pk] = bridge
+        self.names[(bridge.db_faction_id, bridge.db_iname)] = bridge.pk
+        self.inames[bridge.pk] = (bridge.db_faction_id, bridge.db_iname)
+        self.by_faction[bridge.db_faction_id].add(bridge.pk)
+
+    def remove(self, bridge):
+        bridge_id = bridge.pk if hasattr(bridge, 'pk') else bridge
+        if (key := self.inames.pop(bridge_id, None)) is None:
+            return
+        self.names.pop(key, None)
+        self.bridges.pop(bridge_id, None)
+        self.by_faction[key[0]].discard(bridge_id)
+        if not self.by_faction[key[0]]:
+            del self.by_faction[key[0]]
+
+    def update(self, bridge):
+        self.remove(bridge)
+        self.add(bridge)
+
+    def for_faction(self, faction_id):
+        return sorted((self.bridges[i] for i in self.by_faction.get(faction_id, tuple())), key=lambda b: b.db_iname)
+
+    def match(self, faction_id, text):
+        text = text.strip().lower()
+        if (found := self.names.get((faction_id, text))) is not None:
+            return self.bridges[found]
+        for bridge in self.for_faction(faction_id):
+            if bridge.db_iname.startswith(text):
+                return bridge
+        return None
+
+    def find(self, tree, search_text):
+        if '/' not in search_text:
+            raise ValueError("Divisions are found by Faction/Division!")
+        faction_path, name = search_text.rsplit('/', 1)
+        faction = tree.find(faction_path)
+        if not (found := self.match(faction.pk, name)):
+            raise ValueError(f"Division {name.strip()} not found in {tree.path(faction)}!")
+        return found
+
+
+class FactionRosterIndex:
+    """
+    Live membership and connection state per FactionBridge id.
+
+    Direct rosters and connected sets are kept per Faction, and every Faction also carries
+    a Counter of the entities found anywhere in its subtree, so both direct and rolled-up
+    totals are O(1) reads. Alliances get the same kind of Counter over their member
+    Factions, and each Division keeps its own member set. Entity ids are used throughout; member entities reach their Character
+    through entity.db.reference.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.members = defaultdict(set)
+        self.online = defaultdict(set)
+        self.subtree_members = defaultdict(Counter)
+        self.subtree_online = defaultdict(Counter)
+        self.alliance_members = defaultdict(Counter)
+        self.alliance_online = defaultdict(Counter)
+        self.memberships = defaultdict(set)
+        self.divisions = defaultdict(set)
+        self.characters = dict()
+        self.sessions = defaultdict(set)
+        self.connected = set()
+
+    def clear(self):
+        self.members.clear()
+        self.online.clear()
+        self.subtree_members.clear()
+        self.subtree_online.clear()
+        self.alliance_members.clear()
+        self.alliance_online.clear()
+        self.memberships.clear()
+        self.divisions.clear()
+        self.characters.clear()
+        self.sessions.clear()
+        self.connected.clear()
+
+    def _lineage(self, bridge_id):
+        return [bridge_id] + self.tree.ancestors(bridge_id)
+
+    def _alliance(self, bridge_id):
+        bridge = self.tree.bridges.get(bridge_id)
+        return bridge.db_alliance_id if bridge else None
+
+    def refresh(self, bridge_id, members):
+        for entity_id in list(self.members.get(bridge_id, tuple())):
+            self.discard(bridge_id, entity_id)
+        for member in members:
+            self.add(bridge_id, member)
+
+    def add(self, bridge_id, entity, character=_LOOKUP):
+        """
+        Adds entity to a Faction's roster. The first time an entity is seen its Character
+        comes from character when the caller preloaded it, or from entity.db.reference.
+        """
+        if entity.id in self.members[bridge_id]:
+            return
+        if entity.id not in self.memberships:
+            if character is _LOOKUP:
+                character = entity.db.reference
+            self.characters[entity.id] = character
+            if character and character.is_connected and entity.id not in self.connected:
+                self.connected.add(entity.id)
+                self.sessions[entity.id].update(character.sessions.all())
+        self.members[bridge_id].add(entity.id)
+        self.memberships[entity.id].add(bridge_id)
+        online = entity.id in self.connected
+        if online:
+            self.online[bridge_id].add(entity.id)
+        for ancestor_id in self._lineage(bridge_id):
+            self.subtree_members[ancestor_id][entity.id] += 1
+            if online:
+                self.subtree_online[ancestor_id][entity.id] += 1
+        if (alliance_id := self._alliance(bridge_id)) is not None:
+            self.alliance_members[alliance_id][entity.id] += 1
+            if online:
+                self.alliance_online[alliance_id][entity.id] += 1
+
+    def discard(self, bridge_id, entity):
+        entity_id = getattr(entity, 'id', entity)
+        if entity_id not in self.members.get(bridge_id, tuple()):
+            return
+        self.members[bridge_id].discard(entity_id)
+        self.online[bridge_id].discard(entity_id)
+        self.memberships[entity_id].discard(bridge_id)
+        online = entity_id in self.connected
+        for ancestor_id in self._lineage(bridge_id):
+            _decrement(self.subtree_members[ancestor_id], entity_id)
+            if online:
+                _decrement(self.subtree_online[ancestor_id], entity_id)
+        if (alliance_id := self._alliance(bridge_id)) is not None:
+            _decrement(self.alliance_members[alliance_id], entity_id)
+            if online:
+                _decrement(self.alliance_online[alliance_id], entity_id)
+        if not self.memberships[entity_id]:
+            del self.memberships[entity_id]
+            self.characters.pop(entity_id, None)
+            self.sessions.pop(entity_id, None)
+            self.connected.discard(entity_id)
+
+    def remove(self, bridge_id):
+        self.refresh(bridge_id, tuple())
+        for store in (self.members, self.online, self.subtree_members, self.subtree_online):
+            store.pop(bridge_id, None)
+
+    def detach(self, bridge_id):
+        for ancestor_id in self.tree.ancestors(bridge_id):
+            self.subtree_members[ancestor_id] -= self.subtree_members[bridge_id]
+            self.subtree_online[ancestor_id] -= self.subtree_online[bridge_id]
+
+    def attach(self, bridge_id):
+        for ancestor_id in self.tree.ancestors(bridge_id):
+            self.subtree_members[ancestor_id] += self.subtree_members[bridge_id]
+            self.subtree_online[ancestor_id] += self.subtree_online[bridge_id]
+
+    def leave_alliance(self, bridge_id, alliance_id=_LOOKUP):
+        if alliance_id is _LOOKUP:
+            alliance_id = self._alliance(bridge_id)
+        if alliance_id is None:
+            return
+        self.alliance_members[alliance_id] -= Counter(self.members.get(bridge_id, tuple()))
+        self.alliance_online[alliance_id] -= Counter(self.online.get(bridge_id, tuple()))
+
+    def join_alliance(self, bridge_id):
+        if (alliance_id := self._alliance(bridge_id)) is None:
+            return
+        self.alliance_members[alliance_id] += Counter(self.members.get(bridge_id, tuple()))
+        self.alliance_online[alliance_id] += Counter(self.online.get(bridge_id, tuple()))
+
+    def set_division(self, entity_id, old_division_id=None, new_division_id=None):
+        if old_division_id is not None:
+            self.divisions[old_division_id].discard(entity_id)
+            if not self.divisions[old_division_id]:
+                del self.divisions[old_division_id]
+        if new_division_id is not None:
+            self.divisions[new_division_id].add(entity_id)
+
+    def division_online(self, division_id):
+        members = self.divisions.get(division_id, tuple())
+        return {entity_id for entity_id in members if entity_id in self.connected}
+
+    def connect(self, entity, character=None, session=None):
+        if entity.id not in self.memberships:
+            return
+        if session is not None:
+            self.sessions[entity.id].add(session)
+        if character is not None:
+            self.characters[entity.id] = character
+        if entity.id in self.connected:
+            return
+        self.connected.add(entity.id)
+        for bridge_id in self.memberships[entity.id]:
+            self.online[bridge_id].add(entity.id)
+            for ancestor_id in self._lineage(bridge_id):
+                self.subtree_online[ancestor_id][entity.id] += 1
+            if (alliance_id := self._alliance(bridge_id)) is not None:
+                self.alliance_online[alliance_id][entity.id] += 1
+
+    def disconnect(self, entity, session=None):
+        if entity.id not in self.connected:
+            return
+        if session is not None:
+            self.sessions[entity.id].discard(session)
+            if self.sessions[entity.id]:
+                return
+        self.sessions.pop(entity.id, None)
+        self.connected.discard(entity.id)
+        for bridge_id in self.memberships[entity.id]:
+            self.online[bridge_id].discard(entity.id)
+            for ancestor_id in self._lineage(bridge_id):
+                _decrement(self.subtree_online[ancestor_id], entity.id)
+            if (alliance_id := self._alliance(bridge_id)) is not None:
+                _decrement(self.alliance_online[alliance_id], entity.id)
+
+    def get(self, bridge_id, direct=True):
+        if direct:
+            return len(self.online.get(bridge_id, tuple())), len(self.members.get(bridge_id, tuple()))
+        return len(self.subtree_online.get(bridge_id, tuple())), len(self.subtree_members.get(bridge_id, tuple()))
+
+    def alliance_get(self, alliance_id):
+        return len(self.alliance_online.get(alliance_id, tuple())), len(self.alliance_members.get(alliance_id, tuple()))
+
+    def online_entities(self, bridge_id, direct=True):
+        return (self.online if direct else self.subtree_online).get(bridge_id, tuple())
+
+    def online_characters(self, bridge_id, direct=True):
+        return {self.characters[entity_id] for entity_id in self.online_entities(bridge_id, direct)
+                if self.characters.get(entity_id)}
+
+
+def _decrement(counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
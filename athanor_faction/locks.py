@@ -0,0 +1,99 @@
+import time
+
+from evennia.locks.lockhandler import LockHandler
+
+
+class _LockStorage:
+    lock_storage = ""
+
+
+def _superuser_bypass(accessing_obj):
+    if hasattr(accessing_obj, "account") and getattr(accessing_obj.account, "is_superuser", False):
+        return True
+    if hasattr(accessing_obj, "get_account"):
+        account = accessing_obj.get_account()
+        return not account or account.is_superuser
+    return False
+
+
+def _accessor_key(accessing_obj):
+    return accessing_obj.__class__.__name__, getattr(accessing_obj, 'pk', id(accessing_obj))
+
+
+class CompiledLock:
+    """
+    A lockstring parsed once by Evennia's LockHandler, with each access type's boolean
+    expression turned into a Python function instead of being eval()'d on every check.
+    """
+
+    def __init__(self, lockstring):
+        self.lockstring = lockstring
+        self.checks = dict()
+        parsed = LockHandler(_LockStorage())._parse_lockstring(lockstring) if lockstring else dict()
+        for access_type, (evalstring, func_tup, raw_string) in parsed.items():
+            combine = eval(f"lambda r: {evalstring % tuple(f'r[{i}]' for i in range(len(func_tup)))}")
+            self.checks[access_type] = (combine, func_tup)
+
+    def __contains__(self, access_type):
+        return access_type in self.checks
+
+    def check(self, accessing_obj, obj, access_type):
+        combine, func_tup = self.checks[access_type]
+        return bool(combine(tuple(bool(func(accessing_obj, obj, *args, **kwargs))
+                                  for func, args, kwargs in func_tup)))
+
+
+class LockCache:
+    """
+    Shared store of CompiledLocks keyed by lockstring, plus a short-lived decision cache
+    keyed by (accessor, object, lockstrings, access type).
+    """
+
+    def __init__(self, ttl=5.0, max_decisions=20000):
+        self.ttl = ttl
+        self.max_decisions = max_decisions
+        self.compiled = dict()
+        self.decisions = dict()
+
+    def compile(self, lockstring):
+        if (found := self.compiled.get(lockstring)) is None:
+            found = CompiledLock(lockstring)
+            self.compiled[lockstring] = found
+        return found
+
+    def check(self, accessing_obj, obj, access_type, lockstrings, default=False, no_superuser_bypass=False):
+        if not no_superuser_bypass and _superuser_bypass(accessing_obj):
+            return True
+        key = (_accessor_key(accessing_obj), getattr(obj, 'pk', None), access_type, lockstrings, default)
+        now = time.monotonic()
+        if (found := self.decisions.get(key)) and found[0] > now:
+            return found[1]
+        result = self.evaluate(accessing_obj, obj, access_type, lockstrings, default)
+        if len(self.decisions) >= self.max_decisions:
+            self.decisions.clear()
+        self.decisions[key] = (now + self.ttl, result)
+        return result
+
+    def evaluate(self, accessing_obj, obj, access_type, lockstrings, default=False):
+        for lockstring in lockstrings:
+            if access_type in (lock := self.compile(lockstring)):
+                return lock.check(accessing_obj, obj, access_type)
+        if isinstance(default, str):
+            return self.compile(f"{access_type}:{default}").check(accessing_obj, obj, access_type)
+        return default
+
+    def invalidate(self, obj=None):
+        if obj is None:
+            self.decisions.clear()
+            return
+        for key in [key for key in self.decisions if key[1] == obj.pk]:
+            del self.decisions[key]
+
+    def invalidate_accessors(self, *accessing_objs):
+        """
+        Drops every decision made for these accessors, on any object. Used when something
+        lock functions read about them, such as Faction membership, changes.
+        """
+        accessors = {_accessor_key(accessing_obj) for accessing_obj in accessing_objs if accessing_obj}
+        for key in [key for key in self.decisions if key[0] in accessors]:
+            del self.decisions[key]
@@ -0,0 +1,125 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from athanor_faction.models import FactionClosure, FactionMembership
+
+
+class FactionMaintenance:
+    """
+    Incremental housekeeping run from the controller's at_repeat. Work is split into phases
+    that each handle one batch per step and report where to resume; steps keep running until
+    the per-tick time budget is spent or a full pass has completed. The (phase, last id)
+    cursor survives between ticks, so large tables are walked a slice at a time. Phases that
+    do per-Faction work also check the deadline between Factions and resume after the last
+    one they finished.
+    """
+    phases = ('vacant', 'stale', 'counters', 'closure')
+
+    def __init__(self, controller, budget=0.005, batch_size=100, application_expiry=30, invite_expiry=7,
+                 cursor=None):
+        self.controller = controller
+        self.budget = budget
+        self.batch_size = batch_size
+        self.application_expiry = timedelta(days=application_expiry)
+        self.invite_expiry = timedelta(days=invite_expiry)
+        self.cursor = tuple(cursor) if cursor else (0, 0)
+        self.passes = 0
+        self.deadline = float('inf')
+
+    def expired(self):
+        return time.perf_counter() >= self.deadline
+
+    def run(self):
+        self.deadline = time.perf_counter() + self.budget
+        while not self.expired():
+            phase, last_id = self.cursor
+            next_id = getattr(self, f"sweep_{self.phases[phase]}")(last_id)
+            if next_id is not None:
+                self.cursor = (phase, next_id)
+                continue
+            self.cursor = ((phase + 1) % len(self.phases), 0)
+            if not self.cursor[0]:
+                self.passes += 1
+                break
+        return self.cursor
+
+    def sweep_vacant(self, last_id):
+        vacant = FactionMembership.objects.filter(id__gt=last_id, db_member=False, db_applying=False,
+                                                  db_invited=False, db_reputation=0).order_by('id')
+        if not (found := list(vacant.values_list('id', flat=True)[:self.batch_size])):
+            return None
+        FactionMembership.objects.filter(id__in=found).delete()
+        return found[-1] if len(found) == self.batch_size else None
+
+    def sweep_stale(self, last_id):
+        now = timezone.now()
+        stale_applications = Q(db_applying=True, db_applied_at__lt=now - self.application_expiry)
+        stale_invites = Q(db_invited=True, db_invited_at__lt=now - self.invite_expiry)
+        stale = FactionMembership.objects.filter(stale_applications | stale_invites, id__gt=last_id).order_by('id')
+        if not (found := list(stale.values_list('id', flat=True)[:self.batch_size])):
+            return None
+        with transaction.atomic():
+            FactionMembership.objects.filter(stale_applications, id__in=found).update(
+                db_applying=False, db_application_pitch=None, db_applied_at=None)
+            FactionMembership.objects.filter(stale_invites, id__in=found).update(db_invited=False, db_invited_at=None)
+        return found[-1] if len(found) == self.batch_size else None
+
+    def sweep_counters(self, last_id):
+        roster = self.controller.ndb.roster_index
+        if not (bridge_ids := sorted(i for i in self.controller.ndb.faction_index.bridges if i > last_id)):
+            return None
+        bridge_ids = bridge_ids[:self.batch_size]
+        stored = defaultdict(set)
+        for bridge_id, entity_id in FactionMembership.objects.filter(
+                db_faction_id__in=bridge_ids, db_member=True).values_list('db_faction_id', 'db_entity_id'):
+            stored[bridge_id].add(entity_id)
+        repaired = list()
+        done = None
+        for bridge_id in bridge_ids:
+            if done is not None and self.expired():
+                break
+            cached = roster.members.get(bridge_id, set())
+            if cached != stored[bridge_id]:
+                repaired.append(bridge_id)
+            for entity_id in cached - stored[bridge_id]:
+                roster.discard(bridge_id, entity_id)
+            if (missing := stored[bridge_id] - cached):
+                for membership in FactionMembership.objects.filter(
+                        db_faction_id=bridge_id, db_entity_id__in=missing).select_related('db_entity'):
+                    roster.add(bridge_id, membership.db_entity)
+            online = roster.members.get(bridge_id, set()) & roster.connected
+            if roster.online.get(bridge_id, set()) != online:
+                repaired.append(bridge_id)
+                roster.refresh(bridge_id, [membership.db_entity for membership in FactionMembership.objects.filter(
+                    db_faction_id=bridge_id, db_member=True).select_related('db_entity')])
+            done = bridge_id
+        if repaired and self.controller.ndb.listing_cache:
+            self.controller.ndb.listing_cache.invalidate(repaired)
+        if done != bridge_ids[-1]:
+            return done
+        return done if len(bridge_ids) == self.batch_size else None
+
+    def sweep_closure(self, last_id):
+        tree = self.controller.ndb.faction_index
+        if not (bridge_ids := sorted(i for i in tree.bridges if i > last_id)):
+            return None
+        bridge_ids = bridge_ids[:self.batch_size]
+        stored = defaultdict(set)
+        for ancestor_id, descendant_id, depth in FactionClosure.objects.filter(
+                db_descendant_id__in=bridge_ids).values_list('db_ancestor_id', 'db_descendant_id', 'db_depth'):
+            stored[descendant_id].add((ancestor_id, depth))
+        expected = {bridge_id: set((ancestor_id, depth) for depth, ancestor_id in
+                                   enumerate([bridge_id] + tree.ancestors(bridge_id)))
+                    for bridge_id in bridge_ids}
+        if (broken := [bridge_id for bridge_id in bridge_ids if stored[bridge_id] != expected[bridge_id]]):
+            with transaction.atomic():
+                FactionClosure.objects.filter(db_descendant_id__in=broken).delete()
+                FactionClosure.objects.bulk_create([
+                    FactionClosure(db_ancestor_id=ancestor_id, db_descendant_id=bridge_id, db_depth=depth)
+                    for bridge_id in broken for ancestor_id, depth in expected[bridge_id]])
+        return bridge_ids[-1] if len(bridge_ids) == self.batch_size else None
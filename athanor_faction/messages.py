@@ -1,3 +1,4 @@
+from evennia import GLOBAL_SCRIPTS
 from athanor.utils.submessage import SubMessage
 
 
@@ -19,14 +20,105 @@ class FactionMessage(SubMessage):
         if self.faction and self.faction_message:
             self.send_faction()
 
+    def render_faction_message(self):
+        return self.faction_message.format(**self.variables)
+
     def send_faction(self):
-        chars = set([character for character in self.faction.members(direct=self.message_descendants) if character.is_connected])
-        if self.faction_2:
-            chars += set([character for character in self.faction_2.members(direct=self.message_descendants) if character.is_connected])
-        for c in (self.source, self.target):
-            if c in chars:
-                chars.remove(c)
-        self.send_extra((chars, self.faction_message))
+        factions = [faction for faction in (self.faction, self.faction_2) if faction]
+        exclude = [obj for obj in (self.source, self.target) if obj]
+        GLOBAL_SCRIPTS.faction.broadcast(factions, self.render_faction_message(), direct=self.message_descendants,
+                                         exclude=exclude)
+
+
+class AllianceMessage(FactionMessage):
+    alliance_message = None
+
+    def __init__(self, *args, **kwargs):
+        self.alliance = kwargs.pop('alliance', None)
+        super().__init__(*args, **kwargs)
+        if self.alliance:
+            self.entities['alliance'] = self.alliance
+
+    def send(self):
+        super().send()
+        if self.alliance and self.alliance_message:
+            exclude = [obj for obj in (self.source, self.target) if obj]
+            GLOBAL_SCRIPTS.faction.broadcast_alliance(self.alliance, self.alliance_message.format(**self.variables),
+                                                      exclude=exclude)
+
+
+class AllianceCreateMessage(AllianceMessage):
+    source_message = "Successfully created Alliance: |w{alliance_name}"
+    admin_message = "|w{source_name}|n created Alliance: |w{alliance_name}"
+
+
+class AllianceDeleteMessage(AllianceMessage):
+    source_message = "Successfully |rDELETED|n Alliance: |w{alliance_name}"
+    admin_message = "|w{source_name}|n |rDELETED|n Alliance: |w{alliance_name}"
+
+
+class AllianceRenameMessage(AllianceMessage):
+    source_message = "Successfully renamed Alliance: |w{old_name}|n to |w{alliance_name}"
+    admin_message = "|w{source_name}|n renamed Alliance: |w{old_name}|n to |w{alliance_name}"
+    alliance_message = "|w{source_name}|n renamed Alliance: |w{old_name}|n to |w{alliance_name}"
+
+
+class AllianceJoinMessage(AllianceMessage):
+    source_message = "Successfully added Faction: |w{faction_fullpath}|n to Alliance: |w{alliance_name}"
+    admin_message = "|w{source_name}|n added Faction: |w{faction_fullpath}|n to Alliance: |w{alliance_name}"
+    alliance_message = "|w{source_name}|n added Faction: |w{faction_fullpath}|n to Alliance: |w{alliance_name}"
+
+
+class AllianceLeaveMessage(AllianceMessage):
+    source_message = "Successfully removed Faction: |w{faction_fullpath}|n from Alliance: |w{alliance_name}"
+    admin_message = "|w{source_name}|n removed Faction: |w{faction_fullpath}|n from Alliance: |w{alliance_name}"
+    alliance_message = "|w{source_name}|n removed Faction: |w{faction_fullpath}|n from Alliance: |w{alliance_name}"
+
+
+class DivisionMessage(FactionMessage):
+    division_message = None
+
+    def __init__(self, *args, **kwargs):
+        self.division = kwargs.pop('division', None)
+        super().__init__(*args, **kwargs)
+        if self.division:
+            self.entities['division'] = self.division
+
+    def send(self):
+        super().send()
+        if self.division and self.division_message:
+            exclude = [obj for obj in (self.source, self.target) if obj]
+            GLOBAL_SCRIPTS.faction.broadcast_division(self.division, self.division_message.format(**self.variables),
+                                                      exclude=exclude)
+
+
+class DivisionCreateMessage(DivisionMessage):
+    source_message = "Successfully created Division: |w{division_name}|n in Faction: |w{faction_fullpath}"
+    admin_message = "|w{source_name}|n created Division: |w{division_name}|n in Faction: |w{faction_fullpath}"
+    faction_message = "|w{source_name}|n created Division: |w{division_name}|n in Faction: |w{faction_fullpath}"
+
+
+class DivisionDeleteMessage(DivisionMessage):
+    source_message = "Successfully |rDELETED|n Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+    admin_message = "|w{source_name}|n |rDELETED|n Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+    faction_message = "|w{source_name}|n |rDELETED|n Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+
+
+class DivisionRenameMessage(DivisionMessage):
+    source_message = "Successfully renamed Division: |w{old_name}|n of Faction: |w{faction_fullpath}|n to |w{division_name}"
+    admin_message = "|w{source_name}|n renamed Division: |w{old_name}|n of Faction: |w{faction_fullpath}|n to |w{division_name}"
+    division_message = "|w{source_name}|n renamed Division: |w{old_name}|n of Faction: |w{faction_fullpath}|n to |w{division_name}"
+
+
+class DivisionAssignMessage(DivisionMessage):
+    source_message = "Successfully assigned |w{target_name}|n to Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+    target_message = "|w{source_name}|n assigned you to Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+    division_message = "|w{source_name}|n assigned |w{target_name}|n to Division: |w{division_name}|n of Faction: |w{faction_fullpath}"
+
+
+class DivisionAnnounceMessage(DivisionMessage):
+    source_message = "Sent to Division: |w{division_name}|n of Faction: |w{faction_fullpath}|n - {text}"
+    division_message = "|w[{division_name}]|n |w{source_name}|n: {text}"
 
 
 class FactionCreateMessage(FactionMessage):
@@ -0,0 +1,64 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('objects', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllianceBridge',
+            fields=[
+                ('db_object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='alliance_bridge', serialize=False, to='objects.ObjectDB')),
+                ('db_name', models.CharField(max_length=255)),
+                ('db_iname', models.CharField(max_length=255, unique=True)),
+                ('db_cname', models.CharField(max_length=255)),
+                ('db_abbreviation', models.CharField(max_length=20, null=True)),
+                ('db_iabbreviation', models.CharField(max_length=20, null=True, unique=True)),
+                ('db_system_identifier', models.CharField(max_length=255, null=True, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FactionBridge',
+            fields=[
+                ('db_object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='faction_bridge', serialize=False, to='objects.ObjectDB')),
+                ('db_tier', models.IntegerField(default=0)),
+                ('db_name', models.CharField(max_length=255)),
+                ('db_iname', models.CharField(max_length=255, unique=True)),
+                ('db_cname', models.CharField(max_length=255)),
+                ('db_abbreviation', models.CharField(max_length=20, null=True)),
+                ('db_iabbreviation', models.CharField(max_length=20, null=True, unique=True)),
+                ('db_system_identifier', models.CharField(max_length=255, null=True, unique=True)),
+                ('db_alliance', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='factions', to='athanor_faction.AllianceBridge')),
+                ('db_parent', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='athanor_faction.FactionBridge')),
+            ],
+            options={
+                'verbose_name': 'Faction',
+                'verbose_name_plural': 'Factions',
+            },
+        ),
+        migrations.CreateModel(
+            name='DivisionBridge',
+            fields=[
+                ('db_object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='division_bridge', serialize=False, to='objects.ObjectDB')),
+                ('db_name', models.CharField(max_length=255)),
+                ('db_iname', models.CharField(max_length=255)),
+                ('db_cname', models.CharField(max_length=255)),
+                ('db_system_identifier', models.CharField(max_length=255, null=True, unique=True)),
+                ('db_faction', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='divisions', to='athanor_faction.FactionBridge')),
+            ],
+            options={
+                'verbose_name': 'Division',
+                'verbose_name_plural': 'Divisions',
+                'unique_together': {('db_faction', 'db_iname')},
+            },
+        ),
+    ]
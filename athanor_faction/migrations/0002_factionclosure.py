@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_closure(apps, schema_editor):
+    FactionBridge = apps.get_model('athanor_faction', 'FactionBridge')
+    FactionClosure = apps.get_model('athanor_faction', 'FactionClosure')
+    parents = dict(FactionBridge.objects.values_list('db_object_id', 'db_parent_id'))
+    rows = list()
+    for bridge_id in parents:
+        current, depth = bridge_id, 0
+        while current is not None:
+            rows.append(FactionClosure(db_ancestor_id=current, db_descendant_id=bridge_id, db_depth=depth))
+            current, depth = parents[current], depth + 1
+    FactionClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('athanor_faction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactionClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('db_depth', models.PositiveIntegerField(default=0)),
+                ('db_ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='athanor_faction.FactionBridge')),
+                ('db_descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='athanor_faction.FactionBridge')),
+            ],
+            options={
+                'verbose_name': 'Faction Closure',
+                'verbose_name_plural': 'Faction Closures',
+                'unique_together': {('db_ancestor', 'db_descendant')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='factionclosure',
+            index=models.Index(fields=['db_descendant', 'db_depth'], name='faction_closure_desc_depth'),
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
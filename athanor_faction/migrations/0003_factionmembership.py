@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Legacy link Attribute -> FactionMembership field. A link also carries 'faction' and
+# 'entity' Attributes pointing at the two Objects it joins.
+LINK_FIELDS = {
+    'member': 'db_member',
+    'is_supermember': 'db_supermember',
+    'is_applying': 'db_applying',
+    'invited': 'db_invited',
+    'title': 'db_title',
+    'reputation': 'db_reputation',
+    'application_pitch': 'db_application_pitch',
+}
+
+
+def _packed_id(value):
+    # Evennia stores Object references in Attributes as
+    # ('__packed_dbobj__', natural_key, date_created, id).
+    if isinstance(value, (tuple, list)) and len(value) == 4 and value[0] == '__packed_dbobj__':
+        return value[3]
+    return None
+
+
+def copy_link_attributes(apps, schema_editor):
+    # Reads the link Attributes straight from the historical tables so this migration does
+    # not depend on the typeclass API, and copies every link with standing, not only
+    # members, so pending applications and invites survive.
+    ObjectDB = apps.get_model('objects', 'ObjectDB')
+    FactionBridge = apps.get_model('athanor_faction', 'FactionBridge')
+    FactionMembership = apps.get_model('athanor_faction', 'FactionMembership')
+    through = ObjectDB.db_attributes.through
+    links = defaultdict(dict)
+    for link_id, key, value in through.objects.filter(
+            attribute__db_key__in=list(LINK_FIELDS) + ['faction', 'entity'],
+            attribute__db_category__isnull=True).values_list(
+            'objectdb_id', 'attribute__db_key', 'attribute__db_value').iterator():
+        links[link_id][key] = value
+
+    faction_ids = set(FactionBridge.objects.values_list('db_object_id', flat=True))
+    entity_ids = set(ObjectDB.objects.filter(
+        id__in={_packed_id(found.get('entity')) for found in links.values()}).values_list('id', flat=True))
+    rows = dict()
+    for found in links.values():
+        faction_id, entity_id = _packed_id(found.get('faction')), _packed_id(found.get('entity'))
+        if faction_id not in faction_ids or entity_id not in entity_ids:
+            continue
+        fields = {field: found.get(key) for key, field in LINK_FIELDS.items()}
+        for field in ('db_member', 'db_supermember', 'db_applying', 'db_invited'):
+            fields[field] = bool(fields[field])
+        fields['db_reputation'] = fields['db_reputation'] or 0
+        if not (fields['db_member'] or fields['db_applying'] or fields['db_invited'] or fields['db_reputation']):
+            continue
+        rows[(faction_id, entity_id)] = FactionMembership(db_faction_id=faction_id, db_entity_id=entity_id, **fields)
+    FactionMembership.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '__first__'),
+        ('typeclasses', '__first__'),
+        ('athanor_faction', '0002_factionclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactionMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('db_member', models.BooleanField(default=False)),
+                ('db_supermember', models.BooleanField(default=False)),
+                ('db_applying', models.BooleanField(default=False)),
+                ('db_invited', models.BooleanField(default=False)),
+                ('db_title', models.CharField(blank=True, max_length=255, null=True)),
+                ('db_rank', models.PositiveIntegerField(null=True)),
+                ('db_reputation', models.IntegerField(default=0)),
+                ('db_application_pitch', models.TextField(blank=True, null=True)),
+                ('db_entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faction_memberships', to='objects.ObjectDB')),
+                ('db_faction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='athanor_faction.FactionBridge')),
+            ],
+            options={
+                'verbose_name': 'Faction Membership',
+                'verbose_name_plural': 'Faction Memberships',
+                'unique_together': {('db_faction', 'db_entity')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='factionmembership',
+            index=models.Index(fields=['db_faction', 'db_member'], name='faction_membership_member'),
+        ),
+        migrations.AddIndex(
+            model_name='factionmembership',
+            index=models.Index(fields=['db_faction', 'db_applying'], name='faction_membership_applying'),
+        ),
+        migrations.AddIndex(
+            model_name='factionmembership',
+            index=models.Index(fields=['db_entity', 'db_member'], name='faction_membership_entity'),
+        ),
+        migrations.RunPython(copy_link_attributes, migrations.RunPython.noop),
+    ]
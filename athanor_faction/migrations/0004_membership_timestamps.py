@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_pending(apps, schema_editor):
+    # Rows pending before this migration have no start time; count them from now so the
+    # expiry sweep gives them a full window instead of clearing them on the first tick.
+    FactionMembership = apps.get_model('athanor_faction', 'FactionMembership')
+    now = timezone.now()
+    FactionMembership.objects.filter(db_applying=True).update(db_applied_at=now)
+    FactionMembership.objects.filter(db_invited=True).update(db_invited_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('athanor_faction', '0003_factionmembership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factionmembership',
+            name='db_applied_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='factionmembership',
+            name='db_invited_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(stamp_pending, migrations.RunPython.noop),
+    ]
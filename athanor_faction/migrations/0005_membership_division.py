@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('athanor_faction', '0004_membership_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factionmembership',
+            name='db_division',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memberships', to='athanor_faction.DivisionBridge'),
+        ),
+    ]
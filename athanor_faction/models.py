@@ -17,6 +17,8 @@ class FactionBridge(SharedMemoryModel):
     db_object = models.OneToOneField('objects.ObjectDB', related_name='faction_bridge', primary_key=True,
                                      on_delete=models.CASCADE)
     db_alliance = models.ForeignKey(AllianceBridge, related_name='factions', on_delete=models.PROTECT, null=True)
+    db_parent = models.ForeignKey('self', related_name='children', on_delete=models.PROTECT, null=True)
+    db_tier = models.IntegerField(default=0, null=False)
     db_name = models.CharField(max_length=255, null=False, blank=False)
     db_iname = models.CharField(max_length=255, null=False, blank=False, unique=True)
     db_cname = models.CharField(max_length=255, null=False, blank=False)
@@ -41,4 +43,86 @@ class DivisionBridge(SharedMemoryModel):
     class Meta:
         unique_together = (('db_faction', 'db_iname'),)
         verbose_name = 'Division'
-        verbose_name_plural = 'Divisions'
\ No newline at end of file
+        verbose_name_plural = 'Divisions'
+
+class FactionClosureManager(models.Manager):
+
+    def insert_node(self, bridge):
+        rows = [self.model(db_ancestor_id=bridge.pk, db_descendant_id=bridge.pk, db_depth=0)]
+        if bridge.db_parent_id is not None:
+            rows += [self.model(db_ancestor_id=ancestor_id, db_descendant_id=bridge.pk, db_depth=depth + 1)
+                     for ancestor_id, depth in self.ancestor_rows(bridge.db_parent_id)]
+        self.bulk_create(rows)
+
+    def move_node(self, bridge):
+        subtree = list(self.filter(db_ancestor_id=bridge.pk).values_list('db_descendant_id', 'db_depth'))
+        subtree_ids = [descendant_id for descendant_id, depth in subtree]
+        self.filter(db_descendant_id__in=subtree_ids).exclude(db_ancestor_id__in=subtree_ids).delete()
+        if bridge.db_parent_id is None:
+            return
+        self.bulk_create([self.model(db_ancestor_id=ancestor_id, db_descendant_id=descendant_id,
+                                     db_depth=ancestor_depth + descendant_depth + 1)
+                          for ancestor_id, ancestor_depth in self.ancestor_rows(bridge.db_parent_id)
+                          for descendant_id, descendant_depth in subtree])
+
+    def remove_node(self, bridge):
+        self.filter(models.Q(db_descendant_id=bridge.pk) | models.Q(db_ancestor_id=bridge.pk)).delete()
+
+    def ancestor_rows(self, bridge_id):
+        return self.filter(db_descendant_id=bridge_id).values_list('db_ancestor_id', 'db_depth')
+
+    def is_ancestor(self, ancestor, descendant):
+        return self.filter(db_ancestor_id=ancestor.pk, db_descendant_id=descendant.pk).exists()
+
+    def ancestor_ids(self, bridge, include_self=False):
+        found = self.filter(db_descendant_id=bridge.pk)
+        if not include_self:
+            found = found.exclude(db_depth=0)
+        return list(found.order_by('-db_depth').values_list('db_ancestor_id', flat=True))
+
+    def descendant_ids(self, bridge, include_self=False):
+        found = self.filter(db_ancestor_id=bridge.pk)
+        if not include_self:
+            found = found.exclude(db_depth=0)
+        return list(found.order_by('db_depth').values_list('db_descendant_id', flat=True))
+
+
+class FactionClosure(models.Model):
+    db_ancestor = models.ForeignKey(FactionBridge, related_name='descendant_links', on_delete=models.CASCADE)
+    db_descendant = models.ForeignKey(FactionBridge, related_name='ancestor_links', on_delete=models.CASCADE)
+    db_depth = models.PositiveIntegerField(default=0, null=False)
+
+    objects = FactionClosureManager()
+
+    class Meta:
+        unique_together = (('db_ancestor', 'db_descendant'),)
+        indexes = [models.Index(fields=['db_descendant', 'db_depth'], name='faction_closure_desc_depth')]
+        verbose_name = 'Faction Closure'
+        verbose_name_plural = 'Faction Closures'
+
+
+class FactionMembership(models.Model):
+    db_faction = models.ForeignKey(FactionBridge, related_name='memberships', on_delete=models.CASCADE)
+    db_entity = models.ForeignKey('objects.ObjectDB', related_name='faction_memberships', on_delete=models.CASCADE)
+    db_division = models.ForeignKey(DivisionBridge, related_name='memberships', on_delete=models.SET_NULL, null=True)
+    db_member = models.BooleanField(default=False, null=False)
+    db_supermember = models.BooleanField(default=False, null=False)
+    db_applying = models.BooleanField(default=False, null=False)
+    db_invited = models.BooleanField(default=False, null=False)
+    db_title = models.CharField(max_length=255, null=True, blank=True)
+    db_rank = models.PositiveIntegerField(null=True)
+    db_reputation = models.IntegerField(default=0, null=False)
+    db_application_pitch = models.TextField(null=True, blank=True)
+    db_applied_at = models.DateTimeField(null=True)
+    db_invited_at = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = (('db_faction', 'db_entity'),)
+        indexes = [models.Index(fields=['db_faction', 'db_member'], name='faction_membership_member'),
+                   models.Index(fields=['db_faction', 'db_applying'], name='faction_membership_applying'),
+                   models.Index(fields=['db_entity', 'db_member'], name='faction_membership_entity')]
+        verbose_name = 'Faction Membership'
+        verbose_name_plural = 'Faction Memberships'
+
+    def is_vacant(self):
+        return not (self.db_member or self.db_applying or self.db_invited or self.db_reputation)
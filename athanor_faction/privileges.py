@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+SUPERMEMBER = 1
+
+
+class CompiledPrivileges:
+    """
+    Bit layout for one Faction's privileges. Bit 0 is reserved for supermember status;
+    privileges take the following bits in creation order so existing masks stay valid
+    when new privileges are added.
+    """
+
+    def __init__(self, privileges):
+        self.bits = dict()
+        for position, privilege in enumerate(sorted(privileges, key=lambda p: p.pk), start=1):
+            self.bits[privilege.key.lower()] = 1 << position
+        self.all = SUPERMEMBER
+        for bit in self.bits.values():
+            self.all |= bit
+
+    def bit(self, privilege):
+        if not (found := self.bits.get(str(privilege).lower())):
+            raise ValueError(f"Privilege {privilege} not found!")
+        return found
+
+    def mask(self, privileges):
+        return self.mask_names(privilege.key for privilege in privileges)
+
+    def mask_names(self, names):
+        mask = 0
+        for name in names:
+            mask |= self.bits.get(name.lower(), 0)
+        return mask
+
+
+class PrivilegeResolver:
+    """
+    Caches compiled privilege layouts, per-rank and per-role masks, and the effective
+    (faction, entity) masks built from them.
+    """
+
+    def __init__(self):
+        self.compiled = dict()
+        self.rank_masks = dict()
+        self.role_masks = dict()
+        self.masks = dict()
+        self.faction_keys = defaultdict(set)
+
+    def clear(self):
+        self.compiled.clear()
+        self.rank_masks.clear()
+        self.role_masks.clear()
+        self.masks.clear()
+        self.faction_keys.clear()
+
+    def layout(self, faction):
+        if (found := self.compiled.get(faction.id)) is None:
+            found = CompiledPrivileges(faction.privileges.all())
+            self.compiled[faction.id] = found
+        return found
+
+    def preload(self, faction_id, privileges, rank_names, role_names):
+        layout = CompiledPrivileges(privileges)
+        self.compiled[faction_id] = layout
+        for rank_pk, names in rank_names.items():
+            self.rank_masks[rank_pk] = layout.mask_names(names)
+        for role_pk, names in role_names.items():
+            self.role_masks[role_pk] = layout.mask_names(names)
+
+    def rank_mask(self, faction, rank):
+        if (found := self.rank_masks.get(rank.pk)) is None:
+            found = self.layout(faction).mask(rank.privileges.all())
+            self.rank_masks[rank.pk] = found
+        return found
+
+    def role_mask(self, faction, role):
+        if (found := self.role_masks.get(role.pk)) is None:
+            found = self.layout(faction).mask(role.privileges.all())
+            self.role_masks[role.pk] = found
+        return found
+
+    def compute(self, faction, entity):
+        try:
+            membership = faction.membership(entity, create=False)
+        except ValueError:
+            return 0
+        if not membership.db_member:
+            return 0
+        if membership.db_supermember:
+            return self.layout(faction).all
+        mask = 0
+        if (rank := faction.member_rank(membership)):
+            mask |= self.rank_mask(faction, rank)
+        if (link := faction.member_link(entity)):
+            for role in link.roles.all():
+                mask |= self.role_mask(faction, role)
+        return mask
+
+    def mask(self, faction, entity):
+        key = (faction.id, entity.id)
+        if (found := self.masks.get(key)) is None:
+            found = self.compute(faction, entity)
+            self.masks[key] = found
+            self.faction_keys[faction.id].add(key)
+        return found
+
+    def check(self, faction, entity, privilege):
+        return bool(self.mask(faction, entity) & self.layout(faction).bit(privilege))
+
+    def is_supermember(self, faction, entity):
+        return bool(self.mask(faction, entity) & SUPERMEMBER)
+
+    def invalidate_member(self, faction, entity):
+        self.masks.pop((faction.id, entity.id), None)
+
+    def invalidate_roles(self, faction, roles=None):
+        for role in (roles or faction.roles.all()):
+            self.role_masks.pop(role.pk, None)
+        self.invalidate_faction(faction, layout=False)
+
+    def invalidate_faction(self, faction, layout=True):
+        for key in self.faction_keys.pop(faction.id, tuple()):
+            self.masks.pop(key, None)
+        if layout:
+            self.compiled.pop(faction.id, None)
+            self.rank_masks.clear()
+            self.role_masks.clear()
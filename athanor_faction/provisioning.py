@@ -0,0 +1,160 @@
+from django.db import transaction
+
+from athanor_faction.events import FactionCreated
+from athanor_faction.models import FactionBridge, FactionClosure
+
+
+class FactionProvisioner:
+    """
+    Creates many Factions at once from a list of specs. Each spec is a dict with a 'name' and
+    optionally 'parent' (an existing Faction, a path to one, or the path of an earlier spec in
+    the same batch), 'abbreviation', 'tier', 'description', 'privileges' and 'ranks' (same
+    layout as AthanorFaction.setup_ranks).
+
+    Specs are validated first and failures are reported per spec index. Everything else is
+    written in one transaction: typeclassed objects are still created one by one (each in a
+    savepoint) so Evennia's creation hooks run, and then bridges, closure rows, privileges,
+    ranks and rank privileges are written with one bulk_create apiece.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.index = controller.ndb.faction_index
+        self.names = controller.ndb.names
+        self.typeclass = controller.ndb.faction_typeclass
+
+    def provision(self, specs):
+        errors = dict()
+        plans = self.validate(specs, errors)
+        with transaction.atomic():
+            created = self.create_objects(plans, errors)
+            if created:
+                self.create_bridges(created)
+                self.create_privileges_and_ranks(created)
+        for plan in created:
+            self.index.add(plan['bridge'])
+        self.names.build('faction', [plan['bridge'] for plan in created])
+        for plan in created:
+            self.controller.ndb.events.emit(FactionCreated(plan['bridge'].pk, plan['bridge'].db_parent_id))
+        return [plan['object'] for plan in created], errors
+
+    def validate(self, specs, errors):
+        plans = list()
+        paths = dict()
+        names = set()
+        abbreviations = set()
+        for number, spec in enumerate(specs):
+            try:
+                plan = self.plan(spec, paths, names, abbreviations)
+            except (ValueError, KeyError, TypeError) as err:
+                errors[number] = str(err)
+                continue
+            plan['number'] = number
+            plans.append(plan)
+            names.add(plan['clean_key'].lower())
+            if plan['iabbr']:
+                abbreviations.add(plan['iabbr'])
+        return plans
+
+    def plan(self, spec, paths, names, abbreviations):
+        if not spec.get('name'):
+            raise ValueError("No name entered for new Faction!")
+        key, clean_key = self.typeclass.clean_name(spec['name'])
+        if clean_key.lower() in names or self.names.get('faction_name', clean_key) is not None:
+            raise ValueError(f"Name {clean_key} conflicts with another Faction.")
+        parent_plan, parent_bridge = None, None
+        if (parent := spec.get('parent')):
+            if not isinstance(parent, str):
+                parent_bridge = parent.faction_bridge
+            elif (parent_plan := paths.get(parent.lower())) is None:
+                parent_bridge = self.index.find(parent)
+        tier = int(spec.get('tier') or 0)
+        if tier and parent:
+            raise ValueError("Tiers are not supported for child factions!")
+        abbr = spec.get('abbreviation') or None
+        iabbr = abbr.lower() if abbr else None
+        if iabbr and (iabbr in abbreviations or self.names.get('faction_abbreviation', iabbr) is not None):
+            raise ValueError(f"Abbreviation {abbr} conflicts with another Faction.")
+        ranks = spec.get('ranks') or self.typeclass.setup_ranks
+        privileges = list(spec.get('privileges') or self.typeclass.system_privileges)
+        for details in ranks.values():
+            privileges += [p for p in details.get('privileges', tuple()) if p not in privileges]
+        if parent_plan:
+            path = f"{parent_plan['path']}/{clean_key}"
+        elif parent_bridge:
+            path = f"{self.index.path(parent_bridge)}/{clean_key}"
+        else:
+            path = clean_key
+        plan = {'key': key, 'clean_key': clean_key, 'parent_plan': parent_plan, 'parent_bridge': parent_bridge,
+                'abbr': abbr, 'iabbr': iabbr, 'tier': tier, 'ranks': ranks,
+                'privileges': privileges, 'description': spec.get('description', ''), 'path': path}
+        paths[path.lower()] = plan
+        return plan
+
+    def create_objects(self, plans, errors):
+        created = list()
+        for plan in plans:
+            if plan['parent_plan'] is not None and 'object' not in plan['parent_plan']:
+                errors[plan['number']] = f"Parent of {plan['path']} could not be created."
+                continue
+            try:
+                with transaction.atomic():
+                    obj, obj_errors = self.typeclass.create(plan['clean_key'], description=plan['description'])
+            except Exception as err:
+                obj, obj_errors = None, [str(err)]
+            if not obj:
+                errors[plan['number']] = ', '.join(str(e) for e in obj_errors) or "Could not create Faction."
+                continue
+            plan['object'] = obj
+            created.append(plan)
+        return created
+
+    def create_bridges(self, created):
+        bridges = list()
+        closure = list()
+        lineages = dict()
+        for plan in created:
+            parent = plan['parent_plan']['bridge'] if plan['parent_plan'] else plan['parent_bridge']
+            bridge = FactionBridge(db_object=plan['object'], db_parent=parent, db_name=plan['clean_key'],
+                                   db_iname=plan['clean_key'].lower(), db_cname=plan['key'],
+                                   db_abbreviation=plan['abbr'], db_iabbreviation=plan['iabbr'], db_tier=plan['tier'])
+            plan['bridge'] = bridge
+            bridges.append(bridge)
+            if parent is None:
+                lineage = [bridge.pk]
+            elif parent.pk in lineages:
+                lineage = [bridge.pk] + lineages[parent.pk]
+            else:
+                lineage = [bridge.pk, parent.pk] + self.index.ancestors(parent)
+            lineages[bridge.pk] = lineage
+            closure += [FactionClosure(db_ancestor_id=ancestor_id, db_descendant_id=bridge.pk, db_depth=depth)
+                        for depth, ancestor_id in enumerate(lineage)]
+        FactionBridge.objects.bulk_create(bridges)
+        FactionClosure.objects.bulk_create(closure)
+
+    def create_privileges_and_ranks(self, created):
+        privileges = created[0]['object'].privileges
+        priv_model, priv_fk = privileges.model, privileges.field.name
+        priv_model.objects.bulk_create([priv_model(**{priv_fk: plan['object'], 'db_name': name})
+                                        for plan in created for name in plan['privileges']])
+        objects = [plan['object'] for plan in created]
+        priv_ids = {(owner_id, name): pk for pk, owner_id, name in
+                    priv_model.objects.filter(**{f"{priv_fk}__in": objects}).values_list('pk', priv_fk, 'db_name')}
+
+        ranks = created[0]['bridge'].ranks
+        rank_model, rank_fk = ranks.model, ranks.field.name
+        rank_model.objects.bulk_create([rank_model(**{rank_fk: plan['bridge'], 'db_rank_value': number,
+                                                      'db_name': details['name']})
+                                        for plan in created for number, details in plan['ranks'].items()])
+        bridges = [plan['bridge'] for plan in created]
+        rank_ids = {(owner_id, number): pk for pk, owner_id, number in
+                    rank_model.objects.filter(**{f"{rank_fk}__in": bridges}).values_list('pk', rank_fk,
+                                                                                         'db_rank_value')}
+
+        field = rank_model.privileges.field
+        through = rank_model.privileges.through
+        source, target = f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+        through.objects.bulk_create([through(**{source: rank_ids[(plan['bridge'].pk, number)],
+                                                target: priv_ids[(plan['object'].pk, name)]})
+                                     for plan in created for number, details in plan['ranks'].items()
+                                     for name in details.get('privileges', tuple())])
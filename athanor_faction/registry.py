@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from athanor_faction.unitofwork import unit_of_work
+
+# kind -> (bridge field, scope field). A scope field of None means the key is unique
+# table-wide, matching the unique constraints on the bridge models.
+KINDS = {
+    'alliance_name': ('db_iname', None),
+    'alliance_abbreviation': ('db_iabbreviation', None),
+    'alliance_identifier': ('db_system_identifier', None),
+    'faction_name': ('db_iname', None),
+    'faction_abbreviation': ('db_iabbreviation', None),
+    'faction_identifier': ('db_system_identifier', None),
+    'division_name': ('db_iname', 'db_faction_id'),
+    'division_identifier': ('db_system_identifier', None),
+}
+
+
+def _normalize(key):
+    return key.strip().lower() if isinstance(key, str) else key
+
+
+class Reservation:
+    """
+    Keys held for a pending write. commit() assigns them to the new owner and releases any
+    keys they replace; leaving the with-block without committing frees them again.
+    """
+
+    def __init__(self, registry, keys, replaces=tuple()):
+        self.registry = registry
+        self.keys = keys
+        self.replaces = replaces
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.committed:
+            for key in self.keys:
+                self.registry.reserved.discard(key)
+        return False
+
+    def commit(self, owner_id):
+        self.committed = True
+        for key in self.keys:
+            self.registry.reserved.discard(key)
+            self.registry.claim(key, owner_id)
+        for key in self.replaces:
+            self.registry.unclaim(key, owner_id)
+
+
+class NameRegistry:
+    """
+    Exact-match lookups of names, abbreviations and system identifiers for Alliances,
+    Factions and Divisions, keyed by (kind, scope, normalized key). Claims made inside a
+    unit of work are undone if that unit rolls back.
+    """
+
+    def __init__(self):
+        self.entries = dict()
+        self.owners = defaultdict(set)
+        self.reserved = set()
+
+    def build(self, kind_prefix, bridges):
+        for bridge in bridges:
+            for kind, (field, scope_field) in KINDS.items():
+                if kind.startswith(f"{kind_prefix}_") and (value := getattr(bridge, field)):
+                    scope = getattr(bridge, scope_field) if scope_field else None
+                    self.claim((kind, scope, _normalize(value)), bridge.pk, track=False)
+
+    def key(self, kind, scope, value):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown registry kind: {kind}")
+        return kind, scope, _normalize(value)
+
+    def get(self, kind, value, scope=None):
+        if not value:
+            return None
+        return self.entries.get(self.key(kind, scope, value))
+
+    def reserve(self, *requests, owner_id=None):
+        keys = list()
+        for kind, scope, value in requests:
+            if not value:
+                continue
+            key = self.key(kind, scope, value)
+            found = self.entries.get(key)
+            if key in self.reserved or (found is not None and found != owner_id):
+                raise ValueError(f"{kind.split('_', 1)[0].capitalize()} {kind.split('_', 1)[1]} '{value}' "
+                                 f"is already in use.")
+            if found is None:
+                keys.append(key)
+        self.reserved.update(keys)
+        return Reservation(self, keys)
+
+    def claim(self, key, owner_id, track=True):
+        self.entries[key] = owner_id
+        self.owners[owner_id].add(key)
+        if track and (unit := unit_of_work()).active:
+            unit.on_rollback(lambda: self.discard(key, owner_id))
+
+    def unclaim(self, key, owner_id):
+        self.discard(key, owner_id)
+        if (unit := unit_of_work()).active:
+            unit.on_rollback(lambda: self.claim(key, owner_id, track=False))
+
+    def discard(self, key, owner_id):
+        if self.entries.get(key) == owner_id:
+            del self.entries[key]
+        if (keys := self.owners.get(owner_id)) is not None:
+            keys.discard(key)
+            if not keys:
+                del self.owners[owner_id]
+
+    def release_owner(self, owner_id):
+        for key in list(self.owners.get(owner_id, tuple())):
+            self.unclaim(key, owner_id)
+
+    def replace(self, kind, owner_id, value, scope=None):
+        """
+        Reserve owner_id's new key of this kind; committing releases the old one.
+        """
+        reservation = self.reserve((kind, scope, value), owner_id=owner_id)
+        new_key = self.key(kind, scope, value) if value else None
+        reservation.replaces = [key for key in self.owners.get(owner_id, tuple()) if key[0] == kind and key != new_key]
+        return reservation
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+VIEWER_CLASSES = ('admin', 'player')
+
+
+def listing_row(depth, name, online, total):
+    return 'line', depth, str(name), online, total
+
+
+def text_row(text):
+    return 'text', str(text)
+
+
+def format_line(depth, name, online, total):
+    if not depth:
+        return f"{name:<60}{online:0>3}/{total:0>3}"
+    blank = ' ' * depth + '- '
+    return f"{blank}{name:<{60 - len(blank)}}{online:0>3}/{total:0>3}"
+
+
+def viewer_class(viewer):
+    """
+    The part of a viewer that get_display_name depends on: Builders and up see dbrefs.
+    """
+    return 'admin' if viewer.locks.check_lockstring(viewer, "perm(Builder)") else 'player'
+
+
+def render_listing(rows):
+    """
+    Formats a snapshot of listing rows. Rows are plain tuples built on the reactor, so this
+    touches no models, sessions or account options and is safe to run in a worker thread.
+    """
+    lines = list()
+    for row in rows:
+        if row[0] == 'text':
+            lines.append(row[1])
+            continue
+        kind, depth, name, online, total = row
+        lines.append(format_line(depth, name, online, total))
+    return '\n'.join(lines)
+
+
+class ListingCache:
+    """
+    LRU cache of listing rows keyed by (faction id, viewer class), each entry holding the
+    row at every depth it has been drawn at. Rows keep the display name and counts rather
+    than formatted text, so formatting still happens in render_listing, off the reactor for
+    large listings. Rows only change when the Faction is renamed, moved or re-tiered or its
+    membership or online counts change, so the controller evicts entries from those hooks
+    rather than expiring them.
+    """
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def row(self, faction_id, viewer, depth, build):
+        key = (faction_id, viewer)
+        if (entry := self.entries.get(key)) is None:
+            entry = self.entries[key] = dict()
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        if (found := entry.get(depth)) is None:
+            self.misses += 1
+            found = entry[depth] = listing_row(depth, *build())
+        else:
+            self.hits += 1
+        return found
+
+    def invalidate(self, faction_ids=None):
+        if faction_ids is None:
+            self.entries.clear()
+            return
+        for faction_id in faction_ids:
+            for viewer in VIEWER_CLASSES:
+                self.entries.pop((faction_id, viewer), None)
+
+
+class FactionRenderer:
+    """
+    Runs listing formatters inline for small snapshots and in a dedicated, bounded thread
+    pool for snapshots of at least `threshold` rows. Either way the result is a Deferred
+    firing on the reactor thread.
+    """
+
+    def __init__(self, max_threads=2, threshold=500):
+        self.max_threads = max_threads
+        self.threshold = threshold
+        self.pool = None
+
+    def start_pool(self):
+        if self.pool is None:
+            self.pool = ThreadPool(minthreads=0, maxthreads=self.max_threads, name='athanor_faction_render')
+            self.pool.start()
+            reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+        return self.pool
+
+    def stop(self):
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            pool.stop()
+
+    def render(self, formatter, rows):
+        if self.max_threads < 1 or len(rows) < self.threshold:
+            return defer.maybeDeferred(formatter, rows)
+        return threads.deferToThreadPool(reactor, self.start_pool(), formatter, rows)
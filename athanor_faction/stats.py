@@ -0,0 +1,152 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+from django.db import connection
+
+TIME_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000)
+
+
+class Histogram:
+    """
+    Fixed-bucket counter. Observing a value is a bisect and an increment; percentiles are
+    reported as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0
+        target = fraction * self.count
+        seen = 0
+        for position, found in enumerate(self.buckets):
+            seen += found
+            if seen >= target:
+                return self.bounds[position] if position < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0, 'max': self.max,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95), 'p99': self.percentile(0.99),
+                'buckets': dict(zip([str(b) for b in self.bounds] + ['inf'], self.buckets))}
+
+
+class OperationStats:
+
+    def __init__(self):
+        self.wall_ms = Histogram(TIME_BUCKETS)
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.query_ms = Histogram(TIME_BUCKETS)
+        self.fanout = Histogram(COUNT_BUCKETS)
+        self.errors = 0
+
+    def snapshot(self):
+        return {'wall_ms': self.wall_ms.snapshot(), 'queries': self.queries.snapshot(),
+                'query_ms': self.query_ms.snapshot(), 'fanout': self.fanout.snapshot(), 'errors': self.errors}
+
+
+class _Frame:
+    __slots__ = ('queries', 'query_time', 'fanout')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.fanout = 0
+
+
+class FactionStats:
+    """
+    Per-operation histograms of wall time, database query count and time, and message
+    fan-out. Measurements nest (a command around the controller methods it calls); queries
+    and fan-out are credited to every open measurement.
+    """
+
+    def __init__(self):
+        self.operations = defaultdict(OperationStats)
+        self.frames = list()
+        self.since = time.time()
+
+    def reset(self):
+        self.operations.clear()
+        self.since = time.time()
+
+    def _execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            for frame in self.frames:
+                frame.queries += 1
+                frame.query_time += elapsed
+
+    def add_fanout(self, size):
+        for frame in self.frames:
+            frame.fanout += size
+
+    def measure(self, name, func, *args, **kwargs):
+        frame = _Frame()
+        self.frames.append(frame)
+        failed = False
+        start = time.perf_counter()
+        try:
+            if len(self.frames) == 1:
+                with connection.execute_wrapper(self._execute):
+                    return func(*args, **kwargs)
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.frames.pop()
+            stats = self.operations[name]
+            stats.wall_ms.observe(elapsed * 1000)
+            stats.queries.observe(frame.queries)
+            stats.query_ms.observe(frame.query_time * 1000)
+            stats.fanout.observe(frame.fanout)
+            if failed:
+                stats.errors += 1
+
+    def snapshot(self):
+        return {'since': self.since, 'operations': {name: stats.snapshot()
+                                                     for name, stats in sorted(self.operations.items())}}
+
+
+STATS = FactionStats()
+
+
+def instrument_methods(prefix, names):
+    """
+    Class decorator that records each of the named methods under '<prefix>.<method>'. Only
+    entry points and mutators belong here: lookups called many times per command would pay
+    for a frame and three histogram updates each time and bury the real costs in nested
+    timings.
+    """
+    def decorate(cls):
+        for name in names:
+            setattr(cls, name, _instrumented(f"{prefix}.{name}", getattr(cls, name)))
+        return cls
+    return decorate
+
+
+def _instrumented(name, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        return STATS.measure(name, method, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,72 @@
+from evennia import GLOBAL_SCRIPTS
+from evennia.utils.test_resources import EvenniaTest
+
+from athanor_faction.models import FactionBridge, FactionClosure
+
+
+class TestFactionClosureMoveNode(EvenniaTest):
+    """
+    After every move the closure table must hold exactly one row per (ancestor, descendant)
+    pair along each Faction's parent chain, including the depth 0 self rows.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.controller = GLOBAL_SCRIPTS.faction
+        specs = [{'name': 'Empire'}, {'name': 'Navy', 'parent': 'Empire'}, {'name': 'Fleet', 'parent': 'Empire/Navy'},
+                 {'name': 'Wing', 'parent': 'Empire/Navy/Fleet'}, {'name': 'Republic'},
+                 {'name': 'Senate', 'parent': 'Republic'}]
+        factions, errors = self.controller.provision_factions(specs)
+        self.assertEqual(errors, dict())
+        self.factions = {faction.key: faction for faction in factions}
+
+    def bridge(self, name):
+        return self.factions[name].faction_bridge
+
+    def expected(self):
+        parents = dict(FactionBridge.objects.values_list('pk', 'db_parent_id'))
+        rows = set()
+        for bridge_id in parents:
+            ancestor_id, depth = bridge_id, 0
+            while ancestor_id is not None:
+                rows.add((ancestor_id, bridge_id, depth))
+                ancestor_id, depth = parents[ancestor_id], depth + 1
+        return rows
+
+    def actual(self):
+        return set(FactionClosure.objects.values_list('db_ancestor_id', 'db_descendant_id', 'db_depth'))
+
+    def move(self, name, new_parent=None):
+        faction = self.factions[name]
+        faction.change_parent(self.factions[new_parent] if new_parent else None)
+        FactionClosure.objects.move_node(faction.faction_bridge)
+
+    def test_provisioned_closure(self):
+        self.assertEqual(self.actual(), self.expected())
+
+    def test_move_subtree_to_other_root(self):
+        self.move('Fleet', 'Republic')
+        self.assertEqual(self.actual(), self.expected())
+        self.assertTrue(FactionClosure.objects.is_ancestor(self.bridge('Republic'), self.bridge('Wing')))
+        self.assertFalse(FactionClosure.objects.is_ancestor(self.bridge('Navy'), self.bridge('Wing')))
+        self.assertEqual(FactionClosure.objects.ancestor_ids(self.bridge('Wing')),
+                         [self.bridge('Republic').pk, self.bridge('Fleet').pk])
+
+    def test_move_to_deeper_parent(self):
+        self.move('Senate', 'Wing')
+        self.assertEqual(self.actual(), self.expected())
+        self.assertEqual(FactionClosure.objects.ancestor_ids(self.bridge('Senate')),
+                         [self.bridge(name).pk for name in ('Empire', 'Navy', 'Fleet', 'Wing')])
+
+    def test_move_to_root(self):
+        self.move('Navy')
+        self.assertEqual(self.actual(), self.expected())
+        self.assertEqual(FactionClosure.objects.descendant_ids(self.bridge('Empire')), list())
+        self.assertEqual(FactionClosure.objects.descendant_ids(self.bridge('Navy'), include_self=True),
+                         [self.bridge(name).pk for name in ('Navy', 'Fleet', 'Wing')])
+
+    def test_move_back(self):
+        before = self.actual()
+        self.move('Fleet', 'Senate')
+        self.move('Fleet', 'Navy')
+        self.assertEqual(self.actual(), before)
@@ -0,0 +1,170 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from athanor_faction.indexes import PrefixIndex, FactionTreeIndex, FactionRosterIndex
+
+
+class TestPrefixIndex(TestCase):
+
+    def setUp(self):
+        self.words = {1: 'navy', 2: 'navigators', 3: 'nav', 4: 'army'}
+        self.index = PrefixIndex(lambda key_id: (len(self.words[key_id]), key_id))
+        for key_id, word in self.words.items():
+            self.index.add(word, key_id)
+
+    def test_exact(self):
+        self.assertEqual(self.index.exact('navy'), 1)
+        self.assertEqual(self.index.exact('nav'), 3)
+        self.assertIsNone(self.index.exact('na'))
+        self.assertIsNone(self.index.exact('fleet'))
+
+    def test_prefix_prefers_best_rank(self):
+        self.assertEqual(self.index.prefix('n'), 3)
+        self.assertEqual(self.index.prefix('navi'), 2)
+        self.assertEqual(self.index.prefix('a'), 4)
+        self.assertIsNone(self.index.prefix('x'))
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 4)
+
+    def test_remove(self):
+        self.index.remove('nav', 3)
+        self.assertIsNone(self.index.exact('nav'))
+        self.assertEqual(self.index.prefix('nav'), 1)
+        self.index.remove('navigators', 2)
+        self.assertIsNone(self.index.prefix('navi'))
+        self.assertNotIn('i', self.index.root.children['n'].children['a'].children['v'].children)
+        self.assertEqual(len(self.index), 2)
+
+    def test_remove_missing(self):
+        self.index.remove('fleet', 9)
+        self.index.remove('navy', 9)
+        self.assertEqual(self.index.exact('navy'), 1)
+        self.assertEqual(len(self.index), 4)
+
+    def test_readd_after_remove(self):
+        self.index.remove('navy', 1)
+        self.words[5] = 'navy'
+        self.index.add('navy', 5)
+        self.assertEqual(self.index.exact('navy'), 5)
+        self.assertEqual(self.index.prefix('navy'), 5)
+
+    def test_add_offers_better_rank(self):
+        self.assertEqual(self.index.prefix('na'), 3)
+        self.words[6] = 'n'
+        self.index.add('n', 6)
+        self.assertEqual(self.index.prefix('n'), 6)
+        self.assertEqual(self.index.prefix('na'), 3)
+
+
+def _bridge(pk, name, parent_id=None, alliance_id=None):
+    return SimpleNamespace(pk=pk, db_name=name, db_iname=name.lower(), db_parent_id=parent_id,
+                           db_iabbreviation=None, db_tier=0, db_alliance_id=alliance_id)
+
+
+def _entity(entity_id):
+    return SimpleNamespace(id=entity_id)
+
+
+class _Character:
+
+    def __init__(self, is_connected):
+        self.is_connected = is_connected
+        self.sessions = SimpleNamespace(all=lambda: ['session'] if is_connected else [])
+
+
+class TestFactionRosterIndex(TestCase):
+    """
+    Empire(1) > Navy(2) > Fleet(3), plus Republic(4); Navy and Republic share alliance 10.
+    """
+
+    def setUp(self):
+        self.bridges = {1: _bridge(1, 'Empire'), 2: _bridge(2, 'Navy', 1, 10), 3: _bridge(3, 'Fleet', 2),
+                        4: _bridge(4, 'Republic', alliance_id=10)}
+        self.tree = FactionTreeIndex()
+        self.tree.build(self.bridges.values())
+        self.roster = FactionRosterIndex(self.tree)
+        self.online = _Character(True)
+        self.offline = _Character(False)
+        self.roster.add(3, _entity(100), character=self.online)
+        self.roster.add(2, _entity(100), character=self.online)
+        self.roster.add(3, _entity(101), character=self.offline)
+        self.roster.add(4, _entity(102), character=None)
+
+    def test_direct_counts(self):
+        self.assertEqual(self.roster.get(3), (1, 2))
+        self.assertEqual(self.roster.get(2), (1, 1))
+        self.assertEqual(self.roster.get(1), (0, 0))
+
+    def test_subtree_counts_distinct_entities(self):
+        self.assertEqual(self.roster.get(1, direct=False), (1, 2))
+        self.assertEqual(self.roster.get(2, direct=False), (1, 2))
+        self.assertEqual(self.roster.subtree_members[1][100], 2)
+
+    def test_alliance_counts(self):
+        self.assertEqual(self.roster.alliance_get(10), (1, 2))
+
+    def test_add_is_idempotent(self):
+        self.roster.add(3, _entity(101), character=self.offline)
+        self.assertEqual(self.roster.get(1, direct=False), (1, 2))
+
+    def test_preloaded_character_skips_reference(self):
+        self.assertIs(self.roster.characters[102], None)
+        self.assertEqual(self.roster.online_characters(1, direct=False), {self.online})
+
+    def test_discard(self):
+        self.roster.discard(3, _entity(100))
+        self.assertEqual(self.roster.get(3), (0, 1))
+        self.assertEqual(self.roster.get(1, direct=False), (1, 2))
+        self.roster.discard(2, 100)
+        self.assertEqual(self.roster.get(1, direct=False), (0, 1))
+        self.assertEqual(self.roster.alliance_get(10), (0, 1))
+        self.assertNotIn(100, self.roster.memberships)
+        self.assertNotIn(100, self.roster.connected)
+
+    def test_connect_and_disconnect(self):
+        entity = _entity(101)
+        self.roster.connect(entity, session='session')
+        self.assertEqual(self.roster.get(1, direct=False), (2, 2))
+        self.roster.connect(entity, session='other')
+        self.roster.disconnect(entity, session='session')
+        self.assertEqual(self.roster.get(3), (2, 2))
+        self.roster.disconnect(entity, session='other')
+        self.assertEqual(self.roster.get(3), (1, 2))
+        self.assertEqual(self.roster.get(1, direct=False), (1, 2))
+
+    def test_move_subtree(self):
+        self.roster.detach(3)
+        self.tree.bridges[3].db_parent_id = 4
+        self.tree.move(self.bridges[3])
+        self.roster.attach(3)
+        self.assertEqual(self.roster.get(4, direct=False), (1, 3))
+        self.assertEqual(self.roster.get(1, direct=False), (1, 1))
+        self.assertEqual(self.roster.get(2, direct=False), (1, 1))
+
+    def test_alliance_change(self):
+        self.roster.leave_alliance(2)
+        self.bridges[2].db_alliance_id = 11
+        self.roster.join_alliance(2)
+        self.assertEqual(self.roster.alliance_get(10), (0, 1))
+        self.assertEqual(self.roster.alliance_get(11), (1, 1))
+        self.roster.leave_alliance(2, 11)
+        self.bridges[2].db_alliance_id = 10
+        self.roster.join_alliance(2)
+        self.assertEqual(self.roster.alliance_get(10), (1, 2))
+        self.assertEqual(self.roster.alliance_get(11), (0, 0))
+
+    def test_remove_faction(self):
+        self.roster.remove(3)
+        self.assertEqual(self.roster.get(1, direct=False), (1, 1))
+        self.assertNotIn(101, self.roster.memberships)
+        self.assertNotIn(3, self.roster.subtree_members)
+
+    def test_divisions(self):
+        self.roster.set_division(100, new_division_id=7)
+        self.roster.set_division(101, new_division_id=7)
+        self.assertEqual(self.roster.division_online(7), {100})
+        self.roster.set_division(100, 7, 8)
+        self.assertEqual(self.roster.divisions[7], {101})
+        self.roster.set_division(101, old_division_id=7)
+        self.assertNotIn(7, self.roster.divisions)
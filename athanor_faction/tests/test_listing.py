@@ -0,0 +1,126 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from evennia import GLOBAL_SCRIPTS
+from evennia.utils.create import create_object
+from evennia.utils.test_resources import EvenniaTest
+
+from athanor_faction.benchmarks import BenchSession
+from athanor_faction.commands import CmdFactions
+from athanor_faction.render import FactionRenderer
+
+
+class TestListingQueryBudget(EvenniaTest):
+    """
+    The @faction listing is drawn from the controller's indexes, so the number of queries it
+    runs must not grow with the number of Factions or members.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.controller = GLOBAL_SCRIPTS.faction
+        self.session = BenchSession(self.account)
+        self.renderer, self.controller.ndb.renderer = self.controller.ndb.renderer, FactionRenderer(max_threads=0)
+        self.output = list()
+        self.cmd = CmdFactions()
+        self.cmd.caller = self.char1
+        self.cmd.account = self.account
+        self.cmd.session = self.session
+        self.cmd.msg = self.output.append
+        self.created = 0
+
+    def tearDown(self):
+        self.controller.ndb.renderer = self.renderer
+        super().tearDown()
+
+    def grow(self, roots, children, members):
+        specs = list()
+        for _ in range(roots):
+            self.created += 1
+            root = f"Budget{self.created}"
+            specs.append({'name': root})
+            specs += [{'name': f"{root}-{number}", 'parent': root} for number in range(children)]
+        factions, errors = self.controller.provision_factions(specs)
+        self.assertEqual(errors, dict())
+        for faction in factions:
+            for number in range(members):
+                character = create_object(self.char1.typeclass_path, key=f"{faction.key}-Member{number}")
+                self.controller.add_member(self.session, faction, character.entity)
+
+    def listing_queries(self):
+        self.controller.ndb.listing_cache.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            self.cmd.display_factions()
+        return len(queries.captured_queries)
+
+    def test_listing_query_count_is_constant(self):
+        self.grow(roots=1, children=1, members=1)
+        small = self.listing_queries()
+        self.grow(roots=3, children=4, members=3)
+        large = self.listing_queries()
+        self.assertEqual(small, large)
+        self.assertIn('Budget4-3', self.output[-1])
+
+
+class TestListingOutput(EvenniaTest):
+    """
+    Golden output for @faction and @faction <name> on a small tree. Every member is
+    connected, so the online and total columns match what the old per-member listing drew,
+    and children come out in name order as before.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.controller = GLOBAL_SCRIPTS.faction
+        self.session = BenchSession(self.account)
+        self.renderer, self.controller.ndb.renderer = self.controller.ndb.renderer, FactionRenderer(max_threads=0)
+        specs = [{'name': 'Empire', 'tier': 1}, {'name': 'Navy', 'parent': 'Empire'},
+                 {'name': 'Army', 'parent': 'Empire'}, {'name': 'Fleet', 'parent': 'Empire/Navy'},
+                 {'name': 'Republic'}]
+        factions, errors = self.controller.provision_factions(specs)
+        self.assertEqual(errors, dict())
+        self.factions = {faction.key: faction for faction in factions}
+        for name, characters in (('Navy', (self.char1, self.char2)), ('Fleet', (self.char2,))):
+            for character in characters:
+                self.controller.add_member(self.session, self.factions[name], character.entity)
+        for character in (self.char1, self.char2):
+            self.controller.at_character_connect(character, session=BenchSession(character))
+        self.output = list()
+        self.cmd = CmdFactions()
+        self.cmd.caller = self.char1
+        self.cmd.account = self.account
+        self.cmd.session = self.session
+        self.cmd.msg = self.output.append
+
+    def tearDown(self):
+        self.controller.ndb.renderer = self.renderer
+        super().tearDown()
+
+    def line(self, name, counts, depth=0):
+        fname = self.factions[name].get_display_name(self.char1)
+        if not depth:
+            return f"{fname:<60}{counts}"
+        blank = ' ' * depth + '- '
+        return f"{blank}{fname:<{60 - len(blank)}}{counts}"
+
+    def test_display_factions(self):
+        self.cmd.display_factions()
+        expected = [self.cmd.styled_header('Factions'),
+                    self.cmd.styled_header('Tier 1 Factions'),
+                    self.line('Empire', '000/000'),
+                    self.line('Army', '000/000', 2),
+                    self.line('Navy', '002/002', 2),
+                    self.line('Fleet', '001/001', 4),
+                    self.cmd.styled_header('Tier 0 Factions'),
+                    self.line('Republic', '000/000'),
+                    self.cmd.styled_footer('Selected: None')]
+        self.assertEqual(self.output, ['\n'.join(str(text) for text in expected)])
+
+    def test_display_faction(self):
+        self.cmd.display_faction(self.factions['Empire'])
+        expected = [self.cmd.styled_header('Faction: Empire'),
+                    self.cmd.styled_separator('Sub-Factions'),
+                    self.line('Army', '000/000'),
+                    self.line('Navy', '002/002'),
+                    self.line('Fleet', '001/001', 2),
+                    self.cmd._blank_footer]
+        self.assertEqual(self.output, ['\n'.join(str(text) for text in expected)])
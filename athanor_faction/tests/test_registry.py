@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from athanor_faction.registry import NameRegistry
+from athanor_faction.unitofwork import unit_of_work
+
+
+def _bridge(pk, name, abbr=None, identifier=None, faction_id=None):
+    return SimpleNamespace(pk=pk, db_iname=name.lower(), db_iabbreviation=abbr, db_system_identifier=identifier,
+                           db_faction_id=faction_id)
+
+
+class TestNameRegistry(TestCase):
+
+    def setUp(self):
+        self.registry = NameRegistry()
+        self.registry.build('faction', [_bridge(1, 'Empire', 'emp', 'empire_id'), _bridge(2, 'Republic')])
+        self.registry.build('division', [_bridge(10, 'Guard', faction_id=1), _bridge(11, 'Guard', faction_id=2)])
+
+    def test_build_and_get(self):
+        self.assertEqual(self.registry.get('faction_name', ' EMPIRE '), 1)
+        self.assertEqual(self.registry.get('faction_abbreviation', 'EMP'), 1)
+        self.assertEqual(self.registry.get('faction_identifier', 'empire_id'), 1)
+        self.assertIsNone(self.registry.get('faction_abbreviation', None))
+        self.assertIsNone(self.registry.get('faction_name', 'Senate'))
+
+    def test_scoped_kinds(self):
+        self.assertEqual(self.registry.get('division_name', 'guard', scope=1), 10)
+        self.assertEqual(self.registry.get('division_name', 'guard', scope=2), 11)
+        self.assertIsNone(self.registry.get('division_name', 'guard'))
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            self.registry.get('faction_motto', 'anything')
+
+    def test_reserve_conflicts(self):
+        with self.assertRaises(ValueError):
+            self.registry.reserve(('faction_name', None, 'republic'))
+        with self.registry.reserve(('faction_name', None, 'Senate')):
+            with self.assertRaises(ValueError):
+                self.registry.reserve(('faction_name', None, 'senate'))
+
+    def test_uncommitted_reservation_is_released(self):
+        with self.registry.reserve(('faction_name', None, 'Senate')):
+            pass
+        self.assertEqual(self.registry.reserved, set())
+        self.assertIsNone(self.registry.get('faction_name', 'Senate'))
+        with self.assertRaises(KeyError):
+            with self.registry.reserve(('faction_name', None, 'Senate')):
+                raise KeyError('creation failed')
+        self.assertEqual(self.registry.reserved, set())
+
+    def test_commit(self):
+        with self.registry.reserve(('faction_name', None, 'Senate'), ('faction_abbreviation', None, None)) as reserved:
+            reserved.commit(3)
+        self.assertEqual(self.registry.get('faction_name', 'senate'), 3)
+        self.assertEqual(self.registry.owners[3], {('faction_name', None, 'senate')})
+
+    def test_replace(self):
+        with self.registry.replace('faction_name', 1, 'Galactic Empire') as reserved:
+            reserved.commit(1)
+        self.assertEqual(self.registry.get('faction_name', 'galactic empire'), 1)
+        self.assertIsNone(self.registry.get('faction_name', 'empire'))
+        self.assertEqual(self.registry.get('faction_abbreviation', 'emp'), 1)
+
+    def test_replace_same_key_for_owner(self):
+        with self.registry.replace('faction_name', 1, 'EMPIRE') as reserved:
+            reserved.commit(1)
+        self.assertEqual(self.registry.get('faction_name', 'empire'), 1)
+
+    def test_replace_with_nothing_clears(self):
+        with self.registry.replace('faction_abbreviation', 1, None) as reserved:
+            reserved.commit(1)
+        self.assertIsNone(self.registry.get('faction_abbreviation', 'emp'))
+        self.assertEqual(self.registry.get('faction_name', 'empire'), 1)
+
+    def test_release_owner(self):
+        self.registry.release_owner(1)
+        self.assertIsNone(self.registry.get('faction_name', 'empire'))
+        self.assertIsNone(self.registry.get('faction_identifier', 'empire_id'))
+        self.assertNotIn(1, self.registry.owners)
+
+    def test_rollback_restores_claims(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                with self.registry.replace('faction_name', 1, 'Galactic Empire') as reserved:
+                    reserved.commit(1)
+                self.registry.release_owner(2)
+                raise ValueError('rolled back')
+        self.assertEqual(self.registry.get('faction_name', 'empire'), 1)
+        self.assertIsNone(self.registry.get('faction_name', 'galactic empire'))
+        self.assertEqual(self.registry.get('faction_name', 'republic'), 2)
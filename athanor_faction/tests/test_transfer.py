@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+from evennia import GLOBAL_SCRIPTS
+from evennia.utils.create import create_account
+from evennia.utils.test_resources import EvenniaTest
+
+from athanor_faction.benchmarks import BenchSession
+from athanor_faction.models import FactionClosure
+
+
+class TestFactionTransfer(EvenniaTest):
+
+    def setUp(self):
+        super().setUp()
+        self.controller = GLOBAL_SCRIPTS.faction
+        self.admin = create_account('FactionAdmin', 'admin@example.com', 'adminpassword', is_superuser=True)
+        self.session = BenchSession(self.admin)
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+        super().tearDown()
+
+    def test_round_trip_nested_hierarchy(self):
+        specs = [{'name': 'Empire', 'abbreviation': 'EMP'}, {'name': 'Navy', 'parent': 'Empire'},
+                 {'name': 'Fleet', 'parent': 'Empire/Navy'}, {'name': 'Wing', 'parent': 'Empire/Navy/Fleet'},
+                 {'name': 'Republic'}]
+        factions, errors = self.controller.provision_factions(specs)
+        self.assertEqual(errors, dict())
+        fleet = self.controller.find_faction('Empire/Navy/Fleet')
+        self.controller.add_member(self.session, fleet, self.char1.entity)
+
+        counts = self.controller.export_factions(self.path)
+        self.assertEqual(counts['faction'], 5)
+        self.assertEqual(counts['membership'], 1)
+        for faction in reversed(factions):
+            self.controller.delete_faction(self.session, faction, faction.key)
+        self.assertFalse(FactionClosure.objects.exists())
+
+        imported, skipped = self.controller.import_factions(self.path)
+        self.assertEqual(imported['faction'], 5)
+        self.assertEqual(imported['membership'], 1)
+        self.assertEqual(skipped['membership'], 0)
+        wing = self.controller.find_faction('Empire/Navy/Fleet/Wing')
+        self.assertEqual(self.controller.ndb.faction_index.path(wing.faction_bridge), 'Empire/Navy/Fleet/Wing')
+        self.assertEqual([faction.key for faction in self.controller.ancestors(wing)], ['Empire', 'Navy', 'Fleet'])
+        self.assertEqual(self.controller.find_faction('EMP').key, 'Empire')
+        fleet = self.controller.find_faction('Empire/Navy/Fleet')
+        self.assertTrue(self.controller.is_member(fleet, self.char1.entity))
+        self.assertEqual(self.controller.member_counts(self.controller.find_faction('Empire'), direct=False)[1], 1)
@@ -0,0 +1,85 @@
+from evennia import GLOBAL_SCRIPTS
+from evennia.utils.create import create_account
+from evennia.utils.test_resources import EvenniaTest
+
+from athanor_faction.benchmarks import BenchSession
+from athanor_faction.models import FactionBridge
+from athanor_faction.unitofwork import unit_of_work, mark_dirty, on_rollback, refresh_on_rollback
+
+
+class TestUnitOfWork(EvenniaTest):
+
+    def setUp(self):
+        super().setUp()
+        self.controller = GLOBAL_SCRIPTS.faction
+        self.admin = create_account('FactionAdmin', 'admin@example.com', 'adminpassword', is_superuser=True)
+        self.session = BenchSession(self.admin)
+        factions, errors = self.controller.provision_factions([{'name': 'Empire', 'abbreviation': 'EMP'}])
+        self.assertEqual(errors, dict())
+        self.faction = factions[0]
+        self.bridge = self.faction.faction_bridge
+
+    def stored(self, field):
+        return FactionBridge.objects.filter(pk=self.bridge.pk).values_list(field, flat=True).get()
+
+    def test_flush_on_exit(self):
+        with unit_of_work():
+            with unit_of_work():
+                self.bridge.db_tier = 2
+                mark_dirty(self.bridge, 'db_tier')
+            self.assertEqual(self.stored('db_tier'), 0)
+            self.bridge.db_abbreviation = 'EMPR'
+            mark_dirty(self.bridge, 'db_abbreviation')
+        self.assertEqual(self.stored('db_tier'), 2)
+        self.assertEqual(self.stored('db_abbreviation'), 'EMPR')
+        self.assertFalse(unit_of_work().active)
+
+    def test_outside_unit_saves_immediately(self):
+        self.bridge.db_tier = 3
+        mark_dirty(self.bridge, 'db_tier')
+        self.assertEqual(self.stored('db_tier'), 3)
+        on_rollback(self.fail)
+        self.assertEqual(unit_of_work().rollbacks, list())
+
+    def test_rollback_refreshes_then_runs_callbacks(self):
+        seen = list()
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                self.bridge.db_tier = 2
+                mark_dirty(self.bridge, 'db_tier')
+                on_rollback(lambda: seen.append(('first', self.bridge.db_tier)))
+                with unit_of_work():
+                    on_rollback(lambda: seen.append(('second', self.bridge.db_tier)))
+                    raise ValueError('rolled back')
+        self.assertEqual(self.bridge.db_tier, 0)
+        self.assertEqual(self.stored('db_tier'), 0)
+        self.assertEqual(seen, [('second', 0), ('first', 0)])
+
+    def test_commit_drops_callbacks(self):
+        with unit_of_work():
+            on_rollback(self.fail)
+        self.assertEqual(unit_of_work().rollbacks, list())
+
+    def test_refresh_on_rollback(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                self.faction.key = 'Changed'
+                refresh_on_rollback(self.faction, 'db_key')
+                raise ValueError('rolled back')
+        self.assertEqual(self.faction.key, 'Empire')
+
+    def test_controller_changes_undone(self):
+        with self.assertRaises(ValueError):
+            with unit_of_work():
+                self.controller.rename_faction(self.session, self.faction, 'Galactic Empire')
+                self.controller.set_abbreviation(self.session, self.faction, 'GE')
+                self.assertEqual(self.controller.find_faction('Galactic'), self.faction)
+                raise ValueError('rolled back')
+        self.assertEqual(self.faction.key, 'Empire')
+        self.assertEqual(self.bridge.db_name, 'Empire')
+        self.assertEqual(self.controller.ndb.faction_index.path(self.bridge), 'Empire')
+        self.assertEqual(self.controller.find_faction('EMP'), self.faction)
+        self.assertEqual(self.controller.ndb.names.get('faction_name', 'empire'), self.bridge.pk)
+        self.assertIsNone(self.controller.ndb.names.get('faction_name', 'galactic empire'))
+        with self.assertRaises(ValueError):
+            self.controller.find_faction('Galactic')
@@ -0,0 +1,286 @@
+"""
+Streaming export and import of the whole Faction System as JSON lines.
+
+Every line is one record with a 'kind'. Export writes them in dependency order: alliances,
+factions (parents before children), divisions, privileges, ranks, roles, then memberships.
+Import replays that order and bulk-creates each kind in batches, with one transaction per
+batch. Ids in a file are the exporting game's ids; import maps them to the new rows as
+it goes. Member entities live outside the Faction System and are not exported, so each
+membership names its entity by id, key and typeclass. Import resolves the entity through
+the caller's entity_ids mapping (exported id -> target id) when one is given, otherwise
+through the one Object in the target game with that key and typeclass. Rows that resolve
+to no entity, or to more than one, are skipped and counted.
+"""
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.utils.dateparse import parse_datetime
+
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
+
+from athanor_faction.models import AllianceBridge, FactionBridge, DivisionBridge, FactionClosure, FactionMembership
+
+FORMAT = 2
+ORDER = ('alliance', 'faction', 'division', 'privilege', 'rank', 'role', 'membership')
+MEMBERSHIP_FIELDS = ('db_member', 'db_supermember', 'db_applying', 'db_invited', 'db_title', 'db_rank',
+                     'db_reputation', 'db_application_pitch', 'db_applied_at', 'db_invited_at')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while (chunk := list(islice(iterator, size))):
+        yield chunk
+
+
+def _reverse(model, accessor):
+    descriptor = getattr(model, accessor)
+    return descriptor.rel.related_model, descriptor.field.name
+
+
+def _privilege_through(model):
+    field = model.privileges.field
+    return model.privileges.through, f"{field.m2m_field_name()}_id", field.m2m_reverse_field_name()
+
+
+class FactionExporter:
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+
+    def export(self, path):
+        counts = Counter()
+        with open(path, 'w') as output:
+            for record in self.records():
+                output.write(json.dumps(record, cls=DjangoJSONEncoder))
+                output.write('\n')
+                counts[record['kind']] += 1
+        return counts
+
+    def records(self):
+        yield {'kind': 'header', 'format': FORMAT}
+        yield from self.bridges('alliance', AllianceBridge.objects.order_by('db_object'),
+                                ('db_abbreviation',))
+        factions = FactionBridge.objects.annotate(depth=Count('ancestor_links')).order_by('depth', 'db_object')
+        yield from self.bridges('faction', factions, ('db_parent', 'db_alliance', 'db_tier', 'db_abbreviation'))
+        yield from self.bridges('division', DivisionBridge.objects.order_by('db_object'), ('db_faction',))
+        yield from self.owned('privilege', ObjectDB, 'privileges', with_privileges=False)
+        yield from self.owned('rank', FactionBridge, 'ranks', extra=('db_rank_value',))
+        yield from self.owned('role', ObjectDB, 'roles')
+        memberships = FactionMembership.objects.order_by('id').values(
+            'db_faction', 'db_entity', 'db_entity__db_key', 'db_entity__db_typeclass_path', 'db_division',
+            *MEMBERSHIP_FIELDS)
+        for row in memberships.iterator(chunk_size=self.chunk_size):
+            record = {'kind': 'membership', 'faction': row.pop('db_faction'), 'entity': row.pop('db_entity'),
+                      'entity_key': row.pop('db_entity__db_key'),
+                      'entity_typeclass': row.pop('db_entity__db_typeclass_path'),
+                      'division': row.pop('db_division')}
+            record.update({field[3:]: value for field, value in row.items()})
+            yield record
+
+    def descriptions(self, object_ids):
+        through = ObjectDB.db_attributes.through
+        return dict(through.objects.filter(objectdb_id__in=object_ids, attribute__db_key='desc',
+                                           attribute__db_category__isnull=True)
+                    .values_list('objectdb_id', 'attribute__db_value'))
+
+    def bridges(self, kind, queryset, extra):
+        rows = queryset.values('db_object', 'db_object__db_key', 'db_object__db_typeclass_path',
+                               'db_object__db_lock_storage', 'db_name', 'db_cname', 'db_system_identifier', *extra)
+        for chunk in _chunks(rows.iterator(chunk_size=self.chunk_size), self.chunk_size):
+            descriptions = self.descriptions([row['db_object'] for row in chunk])
+            for row in chunk:
+                record = {'kind': kind, 'id': row['db_object'], 'key': row['db_object__db_key'],
+                          'typeclass': row['db_object__db_typeclass_path'],
+                          'locks': row['db_object__db_lock_storage'], 'desc': descriptions.get(row['db_object']),
+                          'name': row['db_name'], 'cname': row['db_cname'],
+                          'system_identifier': row['db_system_identifier']}
+                record.update({field[3:]: row[field] for field in extra})
+                yield record
+
+    def owned(self, kind, owner_model, accessor, extra=tuple(), with_privileges=True):
+        model, owner_field = _reverse(owner_model, accessor)
+        queryset = model.objects.order_by('pk')
+        if owner_model is ObjectDB:
+            queryset = queryset.filter(**{f"{owner_field}__faction_bridge__isnull": False})
+        rows = queryset.values('pk', owner_field, 'db_name', *extra)
+        for chunk in _chunks(rows.iterator(chunk_size=self.chunk_size), self.chunk_size):
+            privileges = defaultdict(list)
+            if with_privileges:
+                through, source, target = _privilege_through(model)
+                for owner_id, name in through.objects.filter(**{f"{source}__in": [row['pk'] for row in chunk]}) \
+                        .values_list(source, f"{target}__db_name"):
+                    privileges[owner_id].append(name)
+            for row in chunk:
+                record = {'kind': kind, 'faction': row[owner_field], 'name': row['db_name']}
+                record.update({field[3:]: row[field] for field in extra})
+                if with_privileges:
+                    record['privileges'] = privileges[row['pk']]
+                yield record
+
+
+class FactionImporter:
+
+    def __init__(self, batch_size=500, entity_ids=None):
+        self.batch_size = batch_size
+        self.entity_ids = {int(old): int(new) for old, new in entity_ids.items()} if entity_ids is not None else None
+        self.ids = defaultdict(dict)
+        self.lineages = dict()
+        self.privilege_ids = dict()
+        self.counts = Counter()
+        self.skipped = Counter()
+        self.stage = 0
+
+    def load(self, path):
+        with open(path) as source:
+            kind, batch = None, list()
+            for line in source:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['kind'] == 'header':
+                    if record.get('format') != FORMAT:
+                        raise ValueError(f"Unsupported export format: {record.get('format')}")
+                    continue
+                if record['kind'] != kind or len(batch) >= self.batch_size:
+                    self.flush(kind, batch)
+                    kind, batch = record['kind'], list()
+                batch.append(record)
+            self.flush(kind, batch)
+        return self.counts, self.skipped
+
+    def flush(self, kind, batch):
+        if not batch:
+            return
+        if kind not in ORDER:
+            raise ValueError(f"Unknown record kind: {kind}")
+        if (stage := ORDER.index(kind)) < self.stage:
+            raise ValueError(f"{kind} records appear after {ORDER[self.stage]} records; file is out of order.")
+        self.stage = stage
+        with transaction.atomic():
+            self.counts[kind] += getattr(self, f"import_{kind}")(batch)
+
+    def mapped(self, kind, old_id):
+        if old_id is None:
+            return None
+        if (found := self.ids[kind].get(old_id)) is None:
+            raise ValueError(f"Record refers to {kind} {old_id}, which was not imported first.")
+        return found
+
+    def create_objects(self, kind, batch):
+        objects = ObjectDB.objects.bulk_create([ObjectDB(db_key=record['key'], db_typeclass_path=record['typeclass'],
+                                                         db_lock_storage=record['locks'] or '') for record in batch])
+        for record, obj in zip(batch, objects):
+            self.ids[kind][record['id']] = obj.pk
+        described = [(obj, record['desc']) for record, obj in zip(batch, objects) if record.get('desc') is not None]
+        if described:
+            attributes = Attribute.objects.bulk_create([Attribute(db_key='desc', db_value=desc)
+                                                        for obj, desc in described])
+            through = ObjectDB.db_attributes.through
+            through.objects.bulk_create([through(objectdb_id=obj.pk, attribute_id=attribute.pk)
+                                         for (obj, desc), attribute in zip(described, attributes)])
+        return objects
+
+    def import_alliance(self, batch):
+        objects = self.create_objects('alliance', batch)
+        AllianceBridge.objects.bulk_create([
+            AllianceBridge(db_object=obj, db_name=record['name'], db_iname=record['name'].lower(),
+                           db_cname=record['cname'], db_abbreviation=record['abbreviation'],
+                           db_iabbreviation=record['abbreviation'].lower() if record['abbreviation'] else None,
+                           db_system_identifier=record['system_identifier'])
+            for record, obj in zip(batch, objects)])
+        return len(batch)
+
+    def import_faction(self, batch):
+        # Parents precede children in the file, often within the same batch, so ids are mapped
+        # once this batch's objects exist and then resolved per record in file order.
+        objects = self.create_objects('faction', batch)
+        bridges = list()
+        closure = list()
+        for record, obj in zip(batch, objects):
+            parent_id = self.mapped('faction', record['parent'])
+            bridges.append(FactionBridge(
+                db_object=obj, db_parent_id=parent_id, db_alliance_id=self.mapped('alliance', record['alliance']),
+                db_tier=record['tier'], db_name=record['name'], db_iname=record['name'].lower(),
+                db_cname=record['cname'], db_abbreviation=record['abbreviation'],
+                db_iabbreviation=record['abbreviation'].lower() if record['abbreviation'] else None,
+                db_system_identifier=record['system_identifier']))
+            lineage = [obj.pk] + (self.lineages[parent_id] if parent_id else list())
+            self.lineages[obj.pk] = lineage
+            closure += [FactionClosure(db_ancestor_id=ancestor_id, db_descendant_id=obj.pk, db_depth=depth)
+                        for depth, ancestor_id in enumerate(lineage)]
+        FactionBridge.objects.bulk_create(bridges)
+        FactionClosure.objects.bulk_create(closure)
+        return len(batch)
+
+    def import_division(self, batch):
+        owners = [self.mapped('faction', record['faction']) for record in batch]
+        objects = self.create_objects('division', batch)
+        DivisionBridge.objects.bulk_create([
+            DivisionBridge(db_object=obj, db_faction_id=owner_id, db_name=record['name'],
+                           db_iname=record['name'].lower(), db_cname=record['cname'],
+                           db_system_identifier=record['system_identifier'])
+            for record, obj, owner_id in zip(batch, objects, owners)])
+        return len(batch)
+
+    def import_privilege(self, batch):
+        model, owner_field = _reverse(ObjectDB, 'privileges')
+        created = model.objects.bulk_create([
+            model(**{f"{owner_field}_id": self.mapped('faction', record['faction']), 'db_name': record['name']})
+            for record in batch])
+        for record, privilege in zip(batch, created):
+            self.privilege_ids[(self.mapped('faction', record['faction']), record['name'])] = privilege.pk
+        return len(batch)
+
+    def create_owned(self, owner_model, accessor, batch, extra=tuple()):
+        model, owner_field = _reverse(owner_model, accessor)
+        owners = [self.mapped('faction', record['faction']) for record in batch]
+        created = model.objects.bulk_create([
+            model(**{f"{owner_field}_id": owner_id, 'db_name': record['name'],
+                     **{f"db_{field}": record[field] for field in extra}})
+            for record, owner_id in zip(batch, owners)])
+        through, source, target = _privilege_through(model)
+        through.objects.bulk_create([through(**{source: obj.pk, f"{target}_id": self.privilege_ids[(owner_id, name)]})
+                                     for record, obj, owner_id in zip(batch, created, owners)
+                                     for name in record['privileges']])
+        return len(batch)
+
+    def import_rank(self, batch):
+        return self.create_owned(FactionBridge, 'ranks', batch, extra=('rank_value',))
+
+    def import_role(self, batch):
+        return self.create_owned(ObjectDB, 'roles', batch)
+
+    def resolve_entities(self, batch):
+        if self.entity_ids is not None:
+            return {record['entity']: self.entity_ids.get(record['entity']) for record in batch}
+        matches = defaultdict(list)
+        for entity_id, key, typeclass in ObjectDB.objects.filter(
+                db_key__in={record['entity_key'] for record in batch}).values_list('id', 'db_key',
+                                                                                   'db_typeclass_path'):
+            matches[(key, typeclass)].append(entity_id)
+        found = dict()
+        for record in batch:
+            candidates = matches.get((record['entity_key'], record['entity_typeclass']), tuple())
+            found[record['entity']] = candidates[0] if len(candidates) == 1 else None
+        return found
+
+    def import_membership(self, batch):
+        entities = self.resolve_entities(batch)
+        rows = list()
+        for record in batch:
+            if (entity_id := entities.get(record['entity'])) is None:
+                self.skipped['membership'] += 1
+                continue
+            fields = {field: record[field[3:]] for field in MEMBERSHIP_FIELDS}
+            for field in ('db_applied_at', 'db_invited_at'):
+                fields[field] = parse_datetime(fields[field]) if fields[field] else None
+            rows.append(FactionMembership(db_faction_id=self.mapped('faction', record['faction']),
+                                          db_division_id=self.mapped('division', record.get('division')),
+                                          db_entity_id=entity_id, **fields))
+        FactionMembership.objects.bulk_create(rows)
+        return len(rows)
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+
+class UnitOfWork:
+    """
+    Collects dirty fields on bridge, rank and membership rows while a command runs. The
+    outermost block opens one transaction; every write made inside it, plus the dirty fields
+    flushed on exit, commits together. Blocks nest. If an exception escapes any of them the
+    transaction is rolled back and the touched fields are reloaded from the database, so the
+    idmapper cache never keeps half of a failed change. Rollback callbacks then run newest
+    first, against the reloaded rows, to undo in-memory index and registry changes.
+    """
+
+    def __init__(self):
+        self.dirty = dict()
+        self.rollbacks = list()
+        self.depth = 0
+        self.failed = False
+        self.atomic = None
+
+    def __enter__(self):
+        if not self.depth:
+            self.atomic = transaction.atomic()
+            self.atomic.__enter__()
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.failed = True
+        self.depth -= 1
+        if self.depth:
+            return False
+        atomic, self.atomic = self.atomic, None
+        try:
+            if not self.failed:
+                self.flush()
+                self.rollbacks = list()
+        except Exception:
+            self.failed = True
+            raise
+        finally:
+            if self.failed:
+                transaction.set_rollback(True)
+            atomic.__exit__(None, None, None)
+            if self.failed:
+                self.discard()
+        return False
+
+    @property
+    def active(self):
+        return self.depth > 0
+
+    def on_rollback(self, callback):
+        self.rollbacks.append(callback)
+
+    def mark(self, instance, *fields):
+        key = (instance.__class__, instance.pk)
+        if key in self.dirty:
+            self.dirty[key][1].update(fields)
+        else:
+            self.dirty[key] = (instance, set(fields))
+
+    def flush(self):
+        if not self.dirty:
+            return
+        groups = defaultdict(list)
+        for instance, fields in self.dirty.values():
+            groups[(instance.__class__, frozenset(fields))].append(instance)
+        for (model, fields), instances in groups.items():
+            if len(instances) == 1:
+                instances[0].save(update_fields=list(fields))
+            else:
+                model.objects.bulk_update(instances, list(fields))
+        self.dirty = dict()
+
+    def discard(self):
+        dirty, self.dirty, self.failed = self.dirty, dict(), False
+        rollbacks, self.rollbacks = self.rollbacks, list()
+        for instance, fields in dirty.values():
+            _refresh(instance, fields)
+        for callback in reversed(rollbacks):
+            callback()
+
+
+def _refresh(instance, fields):
+    try:
+        instance.refresh_from_db(fields=list(fields))
+    except ObjectDoesNotExist:
+        pass
+
+
+_UNIT = UnitOfWork()
+
+
+def unit_of_work():
+    return _UNIT
+
+
+def on_rollback(callback):
+    if _UNIT.active:
+        _UNIT.on_rollback(callback)
+
+
+def refresh_on_rollback(instance, *fields):
+    """
+    For fields that were saved directly rather than through mark_dirty, such as an Object's
+    db_key: reload them if the surrounding unit rolls back.
+    """
+    on_rollback(lambda: _refresh(instance, fields))
+
+
+def mark_dirty(instance, *fields):
+    if _UNIT.active:
+        _UNIT.mark(instance, *fields)
+    else:
+        instance.save(update_fields=list(fields))
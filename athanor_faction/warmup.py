@@ -0,0 +1,94 @@
+import time
+from collections import defaultdict
+from itertools import islice
+
+from evennia.objects.models import ObjectDB
+from evennia.utils.logger import log_info
+
+from athanor_faction.models import FactionBridge
+
+MODES = ('eager', 'lazy', 'off')
+
+
+class FactionWarmup:
+    """
+    Loads ranks, privileges and roles for every Faction after the controller's indexes are
+    built (those already hold every bridge and its ObjectDB), and compiles the privilege
+    resolver's layouts and rank/role masks from them. Rows land in the idmapper cache, so
+    the first commands after a reload don't fetch them one at a time.
+
+    Work is done per chunk of Factions with five queries apiece. 'eager' runs all chunks
+    during at_start; 'lazy' hands the same steps to a Twisted cooperator so they run
+    between other reactor work.
+    """
+
+    def __init__(self, controller, chunk_size=500):
+        self.controller = controller
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.elapsed = 0.0
+
+    def start(self, mode):
+        if mode not in MODES:
+            raise ValueError(f"Unknown faction warm-up mode: {mode}")
+        if mode == 'off':
+            return None
+        if mode == 'eager':
+            for _ in self.steps():
+                pass
+            self.report(mode)
+            return None
+        from twisted.internet import task
+        return task.cooperate(self.steps()).whenDone().addCallback(lambda _: self.report(mode))
+
+    def report(self, mode):
+        index = self.controller.ndb.faction_index
+        bridges = len(index.bridges) + len(self.controller.ndb.alliances) + \
+            len(self.controller.ndb.division_index.bridges)
+        log_info(f"Faction warm-up ({mode}): {bridges} bridges indexed, {self.rows} rank/privilege/role rows "
+                 f"loaded in {self.elapsed:.3f}s")
+
+    def steps(self):
+        bridge_ids = iter(sorted(self.controller.ndb.faction_index.bridges))
+        while (chunk := list(islice(bridge_ids, self.chunk_size))):
+            start = time.perf_counter()
+            self.load(chunk)
+            self.elapsed += time.perf_counter() - start
+            yield
+
+    def owned_names(self, model, owner_field, owner_ids):
+        owners = dict()
+        for row in model.objects.filter(**{f"{owner_field}__in": owner_ids}):
+            owners[row.pk] = getattr(row, f"{owner_field}_id")
+        field = model.privileges.field
+        through = model.privileges.through
+        source = f"{field.m2m_field_name()}_id"
+        names = {pk: list() for pk in owners}
+        for owner_pk, name in through.objects.filter(**{f"{source}__in": list(owners)}) \
+                .values_list(source, f"{field.m2m_reverse_field_name()}__db_name"):
+            names[owner_pk].append(name)
+        self.rows += len(owners)
+        return owners, names
+
+    def load(self, bridge_ids):
+        privileges_model = ObjectDB.privileges.rel.related_model
+        privileges_field = ObjectDB.privileges.field.name
+        privileges = defaultdict(list)
+        for privilege in privileges_model.objects.filter(**{f"{privileges_field}__in": bridge_ids}):
+            privileges[getattr(privilege, f"{privileges_field}_id")].append(privilege)
+            self.rows += 1
+
+        rank_owners, rank_names = self.owned_names(FactionBridge.ranks.rel.related_model,
+                                                   FactionBridge.ranks.field.name, bridge_ids)
+        role_owners, role_names = self.owned_names(ObjectDB.roles.rel.related_model,
+                                                   ObjectDB.roles.field.name, bridge_ids)
+        by_faction = defaultdict(lambda: (dict(), dict()))
+        for rank_pk, owner_id in rank_owners.items():
+            by_faction[owner_id][0][rank_pk] = rank_names[rank_pk]
+        for role_pk, owner_id in role_owners.items():
+            by_faction[owner_id][1][role_pk] = role_names[role_pk]
+
+        resolver = self.controller.ndb.privileges
+        for bridge_id in bridge_ids:
+            ranks, roles = by_faction.get(bridge_id, (dict(), dict()))
+            resolver.preload(bridge_id, privileges.get(bridge_id, tuple()), ranks, roles)